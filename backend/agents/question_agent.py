@@ -1,180 +1,395 @@
 import os
 import json
 import random
-from typing import List, Dict, Optional
-from fuzzywuzzy import fuzz # Used for fuzzy matching to check question similarity
+import bisect
+from typing import Callable, List, Dict, Optional, Tuple, Iterator, TypeVar
+from rapidfuzz import fuzz, process, utils # Used for fuzzy matching to check question similarity (C++ backend)
 
 # Import components
 from backend.components.llm_connector import LLMConnector
 from backend.components.data_loader import DataLoader
+from backend.components.response_cache import ResponseCache
+
+# Response budget per requested question; a subjective question with its reference answer fits comfortably
+_MAX_TOKENS_PER_QUESTION = 384
+
+# Static instructions for each question type, sent as the system message. They are constants, so every request
+# of a type starts with the same tokens and servers with prefix caching skip re-processing them.
+_SYSTEM_PROMPTS = {
+    'single_choice': """
+根据用户提供的技术规范内容生成单选题，题目数量以用户要求为准，要求：
+1. 题目应该考查对该技术规范的理解
+2. 每道题提供3个选项，其中1个正确答案，2个错误答案
+3. 错误答案应该是合理的干扰项
+4. 各题考查的知识点互不相同
+5. 返回JSON数组，每个元素包含question、options、answer字段
+
+返回格式示例：
+[
+    {
+        "question": "问题内容",
+        "options": ["A. 选项1", "B. 选项2", "C. 选项3"],
+        "answer": "A"
+    }
+]
+""",
+    'judge': """
+根据用户提供的技术规范内容生成判断题，题目数量以用户要求为准，要求：
+1. 题目应该考查对该技术规范的理解
+2. 可以是正确的陈述或错误的陈述
+3. 各题考查的知识点互不相同
+4. 返回JSON数组，每个元素包含question、answer字段
+
+返回格式示例：
+[
+    {
+        "question": "问题内容",
+        "answer": "正确"
+    }
+]
+""",
+    'subjective': """
+根据用户提供的技术规范内容生成主观题（问答题），题目数量以用户要求为准，要求：
+1. 题目应该考查对该技术规范内容的理解和阐述能力
+2. 每道题提供一个简洁明了的标准答案
+3. 各题考查的知识点互不相同
+4. 返回JSON数组，每个元素包含question、answer字段
+
+返回格式示例：
+[
+    {
+        "question": "请阐述在进行'停电抄表及显示'时，电能表应具备哪些特性或操作流程？",
+        "answer": "电能表在停电情况下，可通过按键唤醒显示，显示内容应包含重要结算数据，并且所有数据应能在断电情况下至少保存10年。"
+    }
+]
+""",
+}
+
+class QuestionPool:
+    """
+    Groups questions by type so that similarity checks only look at questions of the same type.
+    Question texts are kept in flat lists, which lets rapidfuzz score a new question against
+    a whole bucket in a single batched call. Texts are normalized once when they are added,
+    so comparisons can skip the processor entirely. Each bucket is kept sorted by text length,
+    so questions whose length alone rules out a match are never scored. Normalized texts are
+    also indexed in a dict, so verbatim repeats are found without any scoring.
+    """
+    def __init__(self, questions: Optional[List[Dict]] = None):
+        self.questions_by_type: Dict[str, List[Dict]] = {}
+        self.texts_by_type: Dict[str, List[str]] = {}
+        self.lengths_by_type: Dict[str, List[int]] = {}
+        self.options_by_type: Dict[str, List[Optional[List[str]]]] = {}
+        # First question seen for each (type, normalized text) pair
+        self.exact_index: Dict[Tuple[str, str], Dict] = {}
+        for question in questions or []:
+            self.add(question)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercases the text, replaces punctuation with whitespace and trims it."""
+        return utils.default_process(text)
+
+    def add(self, question: Dict):
+        """
+        Adds a question to the bucket of its type.
+
+        Args:
+            question (Dict): The question to add.
+        """
+        q_type = question['type']
+        options = question.get('options')
+        text = self.normalize(question['question'])
+        self.exact_index.setdefault((q_type, text), question)
+
+        # Insert at the position that keeps the bucket sorted by text length
+        lengths = self.lengths_by_type.setdefault(q_type, [])
+        pos = bisect.bisect_right(lengths, len(text))
+        lengths.insert(pos, len(text))
+        self.questions_by_type.setdefault(q_type, []).insert(pos, question)
+        self.texts_by_type.setdefault(q_type, []).insert(pos, text)
+        self.options_by_type.setdefault(q_type, []).insert(
+            pos, [opt.strip() for opt in options] if options is not None else None
+        )
+
+    def length_window(self, q_type: str, length: int, threshold: int) -> Tuple[int, int]:
+        """
+        Returns the slice of a bucket whose text lengths can still reach the similarity threshold.
+        fuzz.ratio is at most 200 * min(l1, l2) / (l1 + l2), so any text shorter than
+        length * threshold / (200 - threshold) or longer than length * (200 - threshold) / threshold
+        cannot be similar enough.
+
+        Args:
+            q_type (str): The question type of the bucket.
+            length (int): The length of the normalized text to compare.
+            threshold (int): The similarity threshold (0-100).
+
+        Returns:
+            Tuple[int, int]: The start (inclusive) and end (exclusive) positions in the bucket.
+        """
+        lengths = self.lengths_by_type.get(q_type, [])
+        if threshold <= 0:
+            return 0, len(lengths)
+        # Integer ceil/floor division keeps the boundary lengths exact
+        start = bisect.bisect_left(lengths, -(-length * threshold // (200 - threshold)))
+        end = bisect.bisect_right(lengths, length * (200 - threshold) // threshold)
+        return start, end
+
+T = TypeVar('T')
+
+def _shuffled_cycle(items: List[T]) -> Iterator[T]:
+    """
+    Yields every item once in random order, then reshuffles and starts over.
+    Unlike repeated random.choice, no item is picked a second time before all others have been used.
+
+    Args:
+        items (List[T]): The items to cycle through. Must not be empty.
+
+    Yields:
+        T: The next item.
+    """
+    while True:
+        yield from random.sample(items, len(items))
 
 class QuestionAgent:
     """
     Handles the logic for generating questions, checking similarity, and managing question banks.
     """
-    def __init__(self, llm_connector: LLMConnector, data_loader: DataLoader):
+    def __init__(self, llm_connector: LLMConnector, data_loader: DataLoader, max_concurrent_requests: int = 8,
+                 response_cache: Optional[ResponseCache] = None):
         self.llm_connector = llm_connector
         self.data_loader = data_loader
+        # Upper bound on LLM requests in flight at once, keeps bursts within the provider's rate limit
+        self.max_concurrent_requests = max_concurrent_requests
+        # Optional store of generated questions left unused by earlier rounds, served before calling the LLM
+        self.response_cache = response_cache
 
-    def _is_similar_question(self, new_question: Dict, existing_questions: List[Dict], threshold: int = 80) -> bool:
+    def _is_similar_question(self, new_question: Dict, pool: QuestionPool, threshold: int = 80) -> bool:
         """
-        Checks if a newly generated question is similar to any existing questions using fuzzy matching.
+        Checks if a newly generated question is similar to any question in the pool using fuzzy matching.
         Note: For subjective questions, this only checks the question text, not the answer.
         Subjective answer similarity is handled by LLM in quiz_agent.
 
         Args:
             new_question (Dict): The new question to check.
-            existing_questions (List[Dict]): A list of questions to compare against.
+            pool (QuestionPool): The questions to compare against, grouped by type.
             threshold (int): The similarity threshold (0-100). Questions with similarity >= threshold are considered similar.
 
         Returns:
             bool: True if a similar question is found, False otherwise.
         """
-        new_q_text = new_question['question'].strip()
         new_q_type = new_question['type']
 
-        for existing_q in existing_questions:
-            existing_q_text = existing_q['question'].strip()
-            existing_q_type = existing_q['type']
-
-            # Only compare questions of the same type for strict similarity check
-            if new_q_type != existing_q_type:
-                continue
-
-            # Use fuzzy matching to check similarity of question text
-            similarity = fuzz.ratio(new_q_text, existing_q_text)
-            if similarity >= threshold:
-                # For single-choice questions, also consider options similarity
-                if new_q_type == 'single_choice' and 'options' in new_question and 'options' in existing_q:
-                    # Check if at least one option is highly similar
-                    option_similarity_found = False
-                    for new_opt in new_question['options']:
-                        for existing_opt in existing_q['options']:
-                            if fuzz.ratio(new_opt, existing_opt) >= threshold:
-                                option_similarity_found = True
-                                break
-                        if option_similarity_found:
-                            break
-                    if option_similarity_found:
-                        print(f"Detected similar question (Similarity: {similarity}%):")
-                        print(f"  New: {new_q_text}")
-                        print(f"  Existing: {existing_q_text}")
-                        return True
-                else: # For judge and subjective questions, only question text similarity is checked here
-                    print(f"Detected similar question (Similarity: {similarity}%):")
-                    print(f"  New: {new_q_text}")
-                    print(f"  Existing: {existing_q_text}")
-                    return True
-        return False
-
-    def _generate_single_choice_question(self, item: Dict) -> Optional[Dict]:
+        new_q_text = pool.normalize(new_question['question'])
+
+        # A verbatim repeat scores 100, so it is similar at any threshold. Single-choice questions
+        # still need their options compared, so they always take the scoring path below.
+        if new_q_type != 'single_choice':
+            exact_match = pool.exact_index.get((new_q_type, new_q_text))
+            if exact_match is not None:
+                print("Detected similar question (Similarity: 100%):")
+                print(f"  New: {new_question['question'].strip()}")
+                print(f"  Existing: {exact_match['question'].strip()}")
+                return True
+
+        # Only compare questions of the same type, and only those whose length allows a match
+        start, end = pool.length_window(new_q_type, len(new_q_text), threshold)
+        if start >= end:
+            return False
+
+        # Score the new question against that window in one call; scores below the cutoff come back as 0.
+        # Bucket texts are already normalized, so no processor runs per comparison.
+        scores = process.cdist([new_q_text], pool.texts_by_type[new_q_type][start:end], scorer=fuzz.ratio,
+                               processor=None, score_cutoff=threshold, workers=-1)[0]
+        candidate_rows = (scores >= threshold).nonzero()[0] + start
+        if candidate_rows.size == 0:
+            return False
+
+        similar_row = None
+        # For single-choice questions, also consider options similarity
+        if new_q_type == 'single_choice' and 'options' in new_question:
+            new_opts = [opt.strip() for opt in new_question['options']]
+            existing_options = pool.options_by_type[new_q_type]
+
+            # Flatten the options of the candidate rows so they are scored in one call as well
+            flat_opts, owner_rows = [], []
+            for row in candidate_rows:
+                if existing_options[row] is None:
+                    # Existing question has no options, so the question text similarity alone decides
+                    similar_row = row
+                    break
+                flat_opts.extend(existing_options[row])
+                owner_rows.extend([row] * len(existing_options[row]))
+
+            if similar_row is None and new_opts and flat_opts:
+                # Check if at least one option is highly similar
+                opt_scores = process.cdist(new_opts, flat_opts, scorer=fuzz.ratio, processor=None,
+                                           score_cutoff=threshold, workers=-1)
+                matched_cols = (opt_scores >= threshold).any(axis=0).nonzero()[0]
+                if matched_cols.size:
+                    similar_row = owner_rows[matched_cols[0]]
+        else: # For judge and subjective questions, only question text similarity is checked here
+            similar_row = candidate_rows[0]
+
+        if similar_row is None:
+            return False
+
+        print(f"Detected similar question (Similarity: {scores[similar_row - start]:.0f}%):")
+        print(f"  New: {new_question['question'].strip()}")
+        print(f"  Existing: {pool.questions_by_type[new_q_type][similar_row]['question'].strip()}")
+        return True
+
+    def _build_single_choice_prompt(self, item: Dict, count: int) -> str:
         """
-        Generates a single-choice question using the LLM based on a document item.
+        Builds the user prompt asking for `count` single-choice questions about a document item.
+        The instructions are sent separately as the type's system prompt.
 
         Args:
-            item (Dict): The document item (section) to base the question on.
+            item (Dict): The document item (section) to base the questions on.
+            count (int): The number of questions to request.
 
         Returns:
-            Optional[Dict]: A dictionary representing the generated single-choice question, or None if generation fails.
+            str: The prompt for the LLM.
         """
-        prompt = f"""
-基于以下技术规范内容，生成一道单选题：
+        return f"""
+基于以下技术规范内容，生成{count}道单选题：
 
 标题: {item['title']}
 内容: {item['text']}
-
-请生成一道单选题，要求：
-1. 题目应该考查对该技术规范的理解
-2. 提供3个选项，其中1个正确答案，2个错误答案
-3. 错误答案应该是合理的干扰项
-4. 返回JSON格式，包含question、options、answer字段
-
-返回格式示例：
-{{
-    "question": "问题内容",
-    "options": ["A. 选项1", "B. 选项2", "C. 选项3"],
-    "answer": "A"
-}}
 """
-        content = self.llm_connector.generate_text(prompt)
-        if content:
-            question_data = self.llm_connector.parse_single_choice_json(content)
-            if question_data:
-                return question_data
-        # Fallback if LLM generation fails or parsing is unsuccessful
-        return self.llm_connector.generate_fallback_single_choice(item)
 
-    def _generate_judge_question(self, item: Dict) -> Optional[Dict]:
+    def _build_judge_prompt(self, item: Dict, count: int) -> str:
         """
-        Generates a judge (true/false) question using the LLM based on a document item.
+        Builds the user prompt asking for `count` judge (true/false) questions about a document item.
+        The instructions are sent separately as the type's system prompt.
 
         Args:
-            item (Dict): The document item (section) to base the question on.
+            item (Dict): The document item (section) to base the questions on.
+            count (int): The number of questions to request.
 
         Returns:
-            Optional[Dict]: A dictionary representing the generated judge question, or None if generation fails.
+            str: The prompt for the LLM.
         """
-        prompt = f"""
-基于以下技术规范内容，生成一道判断题：
+        return f"""
+基于以下技术规范内容，生成{count}道判断题：
 
 标题: {item['title']}
 内容: {item['text']}
-
-请生成一道判断题，要求：
-1. 题目应该考查对该技术规范的理解
-2. 可以是正确的陈述或错误的陈述
-3. 返回JSON格式，包含question、answer字段
-
-返回格式示例：
-{{
-    "question": "问题内容",
-    "answer": "正确"
-}}
 """
-        content = self.llm_connector.generate_text(prompt)
-        if content:
-            question_data = self.llm_connector.parse_judge_json(content)
-            if question_data:
-                return question_data
-        # Fallback if LLM generation fails or parsing is unsuccessful
-        return self.llm_connector.generate_fallback_judge(item)
 
-    def _generate_subjective_question(self, item: Dict) -> Optional[Dict]:
+    def _build_subjective_prompt(self, item: Dict, count: int) -> str:
         """
-        Generates a subjective question using the LLM based on a document item.
+        Builds the user prompt asking for `count` subjective questions about a document item.
+        The instructions are sent separately as the type's system prompt.
 
         Args:
-            item (Dict): The document item (section) to base the question on.
+            item (Dict): The document item (section) to base the questions on.
+            count (int): The number of questions to request.
 
         Returns:
-            Optional[Dict]: A dictionary representing the generated subjective question, or None if generation fails.
+            str: The prompt for the LLM.
         """
-        prompt = f"""
-基于以下技术规范内容，生成一道主观题（问答题）：
+        return f"""
+基于以下技术规范内容，生成{count}道主观题（问答题）：
 
 标题: {item['title']}
 内容: {item['text']}
+"""
 
-请生成一道主观题，要求：
-1. 题目应该考查对该技术规范内容的理解和阐述能力
-2. 提供一个简洁明了的标准答案
-3. 返回JSON格式，包含question、answer字段
+    def _build_prompt(self, item: Dict, question_type: str, count: int) -> Optional[str]:
+        """
+        Builds the prompt asking for `count` questions of the given type about a document item.
 
-返回格式示例：
-{{
-    "question": "请阐述在进行'停电抄表及显示'时，电能表应具备哪些特性或操作流程？",
-    "answer": "电能表在停电情况下，可通过按键唤醒显示，显示内容应包含重要结算数据，并且所有数据应能在断电情况下至少保存10年。"
-}}
-"""
-        content = self.llm_connector.generate_text(prompt)
+        Args:
+            item (Dict): The document item (section) to base the questions on.
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+            count (int): The number of questions to request.
+
+        Returns:
+            Optional[str]: The prompt for the LLM, or None if the type is unknown.
+        """
+        if question_type == 'single_choice':
+            return self._build_single_choice_prompt(item, count)
+        elif question_type == 'judge':
+            return self._build_judge_prompt(item, count)
+        elif question_type == 'subjective':
+            return self._build_subjective_prompt(item, count)
+        return None
+
+    def _parse_questions(self, content: Optional[str], question_type: str, count: int) -> List[Dict]:
+        """
+        Parses the questions out of an LLM response.
+
+        Args:
+            content (Optional[str]): The raw LLM response, or None if generation failed.
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+            count (int): The number of questions that were requested; extra ones are dropped.
+
+        Returns:
+            List[Dict]: The parsed questions, or an empty list if generation or parsing failed.
+        """
         if content:
-            question_data = self.llm_connector.parse_subjective_json(content)
-            if question_data:
-                return question_data
-        # Fallback if LLM generation fails or parsing is unsuccessful
-        return self.llm_connector.generate_fallback_subjective(item)
+            questions = self.llm_connector.parse_questions_json(content, question_type)
+            if questions:
+                return questions[:count]
+        return []
+
+    def _fallback_questions(self, item: Dict, question_type: str) -> List[Dict]:
+        """
+        Builds a template question for when the LLM produced nothing usable.
 
-    def generate_questions(self, filename: str, count: int) -> List[Dict]:
+        Args:
+            item (Dict): The document item the question is about.
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+
+        Returns:
+            List[Dict]: A single fallback question, or an empty list if the type is unknown.
+        """
+        if question_type == 'single_choice':
+            return [self.llm_connector.generate_fallback_single_choice(item)]
+        elif question_type == 'judge':
+            return [self.llm_connector.generate_fallback_judge(item)]
+        elif question_type == 'subjective':
+            return [self.llm_connector.generate_fallback_subjective(item)]
+        return []
+
+    def _generate_batch(self, tasks: List[Tuple[Dict, str, int]]) -> List[List[Dict]]:
+        """
+        Generates questions for a batch of (item, question_type, count) requests, one LLM call per request.
+        Questions left in the response cache are served first; only requests they do not cover reach the LLM.
+        All calls of the batch are sent concurrently through the connector, capped at `max_concurrent_requests`.
+
+        Args:
+            tasks (List[Tuple[Dict, str, int]]): The document items, question types and per-call question counts.
+
+        Returns:
+            List[List[Dict]]: The questions returned by each request, in the same order as `tasks`.
+                              A request whose generation or parsing failed gets an empty list.
+        """
+        batches = [[] for _ in tasks]
+        pending = [] # (task position, item, question_type, count still needed)
+        for i, (item, question_type, count) in enumerate(tasks):
+            if self.response_cache is not None:
+                batches[i] = self.response_cache.take(question_type, item, count)
+            if len(batches[i]) < count:
+                pending.append((i, item, question_type, count - len(batches[i])))
+        if not pending:
+            return batches
+
+        prompts = [self._build_prompt(item, question_type, count) for _, item, question_type, count in pending]
+        system_prompts = [_SYSTEM_PROMPTS.get(question_type) for _, _, question_type, _ in pending]
+        # Bound the response to what the largest request of the batch can need, instead of the model's full limit
+        max_tokens = max(count for _, _, _, count in pending) * _MAX_TOKENS_PER_QUESTION
+        # Skip the connector's response cache: a repeated request should yield new questions, not the same ones again
+        contents = self.llm_connector.generate_text_many(
+            prompts, max_concurrency=self.max_concurrent_requests, use_cache=False, system_prompts=system_prompts,
+            max_tokens=max_tokens
+        )
+        for (i, _, question_type, count), content in zip(pending, contents):
+            batches[i].extend(self._parse_questions(content, question_type, count))
+        return batches
+
+    def generate_questions(self, filename: str, count: int,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
         """
         Generates a specified number of questions (single-choice, judge, or subjective) from a given document.
         Includes similarity checking to avoid duplicate or very similar questions.
@@ -182,6 +397,8 @@ class QuestionAgent:
         Args:
             filename (str): The name of the document file to generate questions from.
             count (int): The desired number of questions to generate.
+            progress_callback (Optional[Callable[[int, int], None]]): Called after every generation round with
+                                                                      the number of accepted questions and `count`.
 
         Returns:
             List[Dict]: A list of generated questions.
@@ -197,41 +414,60 @@ class QuestionAgent:
             existing_questions_in_bank = self.data_loader.load_question_bank_by_name(f"{base_name}题库")
             print(f"Loaded {len(existing_questions_in_bank)} existing questions from {base_name}题库.json for similarity check.")
 
+            # Bucket the bank by type once; accepted questions are added as they come in
+            similarity_pool = QuestionPool(existing_questions_in_bank)
+
             generated_questions = []
             attempt_count = 0
             max_attempts_per_question = 5 # Max attempts to generate a unique question from one item
             max_total_attempts = count * max_attempts_per_question * 2 # Increased total attempts to ensure enough unique questions
+            max_questions_per_call = 4 # Questions requested from one item in a single LLM call
 
             question_types = ['single_choice', 'judge', 'subjective'] # Include subjective questions
+            # Cover every section of the document before any section is used again,
+            # and keep the question types balanced the same way
+            item_stream = _shuffled_cycle(document)
+            type_stream = _shuffled_cycle(question_types)
 
             while len(generated_questions) < count and attempt_count < max_total_attempts:
-                item = random.choice(document) if document else None
-                if not item:
-                    break
-
-                question_type = random.choice(question_types)
-                new_question = None
-
-                if question_type == 'single_choice':
-                    new_question = self._generate_single_choice_question(item)
-                elif question_type == 'judge':
-                    new_question = self._generate_judge_question(item)
-                elif question_type == 'subjective':
-                    new_question = self._generate_subjective_question(item)
-
-                attempt_count += 1
-
-                if new_question:
-                    # Check similarity against already generated questions in this session and existing bank questions
-                    if not self._is_similar_question(new_question, generated_questions + existing_questions_in_bank):
-                        # Assign a temporary index and source file for the newly generated question
-                        new_question['idx'] = len(generated_questions) + 1
-                        new_question['source_file'] = filename
-                        generated_questions.append(new_question)
-                    else:
-                        print(f"Skipping similar question: {new_question.get('question', 'Unknown question')[:30]}...")
-                else:
-                    print(f"Failed to generate a question for item: {item.get('title', 'Unknown Title')}")
+                # Each call asks for several questions of one type about one item, which shares the prompt
+                # across them. Oversample each round, since some candidates will be dropped as similar.
+                remaining = count - len(generated_questions)
+                per_call = min(max_questions_per_call, remaining)
+                candidate_budget = min(remaining * 2, max_total_attempts - attempt_count)
+                num_calls = -(-candidate_budget // per_call)
+                tasks = [(next(item_stream), next(type_stream), per_call) for _ in range(num_calls)]
+                batches = self._generate_batch(tasks)
+                attempt_count += num_calls * per_call
+
+                # Deduplicate sequentially so every accepted question is visible to the next check
+                for (item, question_type, _), new_questions in zip(tasks, batches):
+                    if len(generated_questions) >= count:
+                        # Keep the candidates this round did not need for a later run on the same item
+                        if self.response_cache is not None:
+                            self.response_cache.add(question_type, item, new_questions)
+                        continue
+                    if not new_questions:
+                        new_questions = self._fallback_questions(item, question_type)
+                    if not new_questions:
+                        print(f"Failed to generate a question for item: {item.get('title', 'Unknown Title')}")
+                        continue
+                    for j, new_question in enumerate(new_questions):
+                        if len(generated_questions) >= count:
+                            if self.response_cache is not None:
+                                self.response_cache.add(question_type, item, new_questions[j:])
+                            break
+                        # Check similarity against already generated questions in this session and existing bank questions
+                        if not self._is_similar_question(new_question, similarity_pool):
+                            # Assign a temporary index and source file for the newly generated question
+                            new_question['idx'] = len(generated_questions) + 1
+                            new_question['source_file'] = filename
+                            generated_questions.append(new_question)
+                            similarity_pool.add(new_question)
+                        else:
+                            print(f"Skipping similar question: {new_question.get('question', 'Unknown question')[:30]}...")
+                if progress_callback is not None:
+                    progress_callback(len(generated_questions), count)
 
             print(f"Generated {len(generated_questions)} unique questions. Total attempts: {attempt_count}")
             return generated_questions
@@ -239,7 +475,8 @@ class QuestionAgent:
             print(f"Error during question generation: {e}")
             return []
 
-    def save_question_bank(self, source_filename: str, new_questions: List[Dict]) -> str:
+    def save_question_bank(self, source_filename: str, new_questions: List[Dict],
+                           existing_questions: Optional[List[Dict]] = None) -> str:
         """
         Saves a new set of questions to a question bank.
         If a bank with the same name exists, it merges new questions and deduplicates them.
@@ -247,6 +484,8 @@ class QuestionAgent:
         Args:
             source_filename (str): The original document filename (e.g., "doc.json").
             new_questions (List[Dict]): The list of newly generated questions.
+            existing_questions (Optional[List[Dict]]): The current content of the bank, if the caller already
+                                                       loaded it. When None, the bank is loaded from disk.
 
         Returns:
             str: The filename of the saved question bank.
@@ -255,28 +494,31 @@ class QuestionAgent:
         question_filename = f"{base_name}题库.json"
 
         all_questions = []
-        # Load existing questions if the bank already exists
-        existing_questions = self.data_loader.load_question_bank_by_name(f"{base_name}题库")
+        # Load existing questions if the bank already exists and the caller did not pass them in
+        if existing_questions is None:
+            existing_questions = self.data_loader.load_question_bank_by_name(f"{base_name}题库")
         if existing_questions:
             all_questions.extend(existing_questions)
             print(f"Detected existing question bank {question_filename}, containing {len(existing_questions)} questions.")
 
-        # Use a set to track question texts for exact deduplication
+        # Use a set to track question texts for exact deduplication; the filter also catches duplicates within new_questions.
         # For subjective questions, only question text is used for deduplication here.
-        seen_questions_text = set(q['question'] for q in all_questions)
-        added_count = 0
-
-        for q in new_questions:
-            if q['question'] not in seen_questions_text:
-                all_questions.append(q)
-                seen_questions_text.add(q['question'])
-                added_count += 1
-            else:
-                print(f"Skipping exactly duplicate question: {q['question'][:30]}...")
-
-        # Re-index all questions to ensure sequential `idx`
-        for i, q in enumerate(all_questions):
-            q['idx'] = i + 1
+        seen_questions_text = {q['question'] for q in all_questions}
+        additions = [q for q in new_questions
+                     if q['question'] not in seen_questions_text and not seen_questions_text.add(q['question'])]
+        all_questions.extend(additions)
+        added_count = len(additions)
+        skipped_count = len(new_questions) - added_count
+        if skipped_count:
+            print(f"Skipped {skipped_count} exactly duplicate questions.")
+
+        # Ensure sequential `idx`. A bank written by this method is already numbered 1..n,
+        # so usually only the appended slice needs numbers; anything else is re-indexed in full.
+        first_new = len(all_questions) - added_count
+        if any(q.get('idx') != i for i, q in enumerate(all_questions[:first_new], 1)):
+            first_new = 0
+        for i, q in enumerate(all_questions[first_new:], first_new + 1):
+            q['idx'] = i
 
         saved_path = self.data_loader.save_question_bank(question_filename, all_questions)
 
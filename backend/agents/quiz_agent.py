@@ -1,13 +1,43 @@
 import re
-from typing import Dict, List
+import asyncio
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from backend.components.llm_connector import LLMConnector # Import LLMConnector
 
+# Accepted spellings of "True" and "False" for judge questions (compared after lower().strip())
+_POSITIVE_ANSWERS = frozenset({'正确', '对', '是', 'true', 'yes', '√'})
+_NEGATIVE_ANSWERS = frozenset({'错误', '不对', '否', 'false', 'no', '×'})
+
+# Extracts the letter from a single-choice option (e.g., "A. Option Text" -> "A")
+_OPTION_LETTER_RE = re.compile(r'([a-d])\.', re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def _option_letter_index(options: Tuple[str, ...]) -> Dict[str, str]:
+    """
+    Maps each normalized option text to its lowercased letter (e.g., "a. option text" -> "a").
+    Cached by the option texts, so every question's options are normalized and matched only once.
+
+    Args:
+        options (Tuple[str, ...]): The options of a single-choice question.
+
+    Returns:
+        Dict[str, str]: The option letter for each option text that has one.
+    """
+    index = {}
+    for option in options:
+        option_letter_match = _OPTION_LETTER_RE.match(option)
+        if option_letter_match:
+            index.setdefault(option.lower().strip(), option_letter_match.group(1).lower())
+    return index
+
 class QuizAgent:
     """
     Handles the logic for taking a quiz and checking answers.
     """
-    def __init__(self, llm_connector: LLMConnector): # Accept LLMConnector
+    def __init__(self, llm_connector: LLMConnector, max_concurrent_requests: int = 8): # Accept LLMConnector
         self.llm_connector = llm_connector
+        # Upper bound on LLM judgments in flight at once when grading in batches
+        self.max_concurrent_requests = max_concurrent_requests
 
     def check_answer(self, question: Dict, user_answer: str) -> bool:
         """
@@ -23,6 +53,7 @@ class QuizAgent:
         """
         try:
             correct_answer = str(question['answer']).lower().strip()
+            raw_user_answer = user_answer # Kept as typed for the LLM judgment
             user_answer = user_answer.lower().strip()
 
             if question['type'] == 'single_choice':
@@ -36,23 +67,15 @@ class QuizAgent:
 
                 # 2. If user input is the full option text, try to match
                 if 'options' in question and isinstance(question['options'], list):
-                    for option in question['options']:
-                        if option.lower().strip() == user_answer:
-                            # Extract the letter from the option (e.g., "A. Option Text" -> "A")
-                            option_letter_match = re.match(r'([a-d])\.', option, re.IGNORECASE)
-                            if option_letter_match and option_letter_match.group(1).lower() == correct_answer:
-                                return True
+                    return _option_letter_index(tuple(question['options'])).get(user_answer) == correct_answer
                 return False
 
             elif question['type'] == 'judge':
                 # Judge question: supports multiple formats for "True" and "False"
-                positive_answers = ['正确', '对', '是', 'true', 'yes', '√']
-                negative_answers = ['错误', '不对', '否', 'false', 'no', '×']
-
-                if correct_answer in positive_answers:
-                    return user_answer in positive_answers
-                elif correct_answer in negative_answers:
-                    return user_answer in negative_answers
+                if correct_answer in _POSITIVE_ANSWERS:
+                    return user_answer in _POSITIVE_ANSWERS
+                elif correct_answer in _NEGATIVE_ANSWERS:
+                    return user_answer in _NEGATIVE_ANSWERS
                 else:
                     # If the correct answer is not in standard positive/negative formats,
                     # perform a strict match
@@ -61,7 +84,7 @@ class QuizAgent:
                 # For subjective questions, use LLM to judge semantic similarity
                 is_similar, _ = self.llm_connector.judge_subjective_answer_with_llm(
                     correct_answer=question['answer'], # Use original case for LLM if possible
-                    user_answer=user_answer # Use original case for LLM if possible
+                    user_answer=raw_user_answer # Use original case for LLM if possible
                 )
                 return is_similar
             return False
@@ -69,3 +92,56 @@ class QuizAgent:
             print(f"Error checking answer: {e}")
             return False
 
+    async def _check_batch(self, qa_pairs: List[Tuple[Dict, str]]) -> List[bool]:
+        """
+        Checks a batch of answers concurrently.
+        check_answer blocks on the LLM for subjective questions, so each check runs in the default
+        thread pool while a semaphore caps how many are in flight at once.
+
+        Args:
+            qa_pairs (List[Tuple[Dict, str]]): The questions and the user's answers to them.
+
+        Returns:
+            List[bool]: Whether each answer is correct, in the same order as `qa_pairs`.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def check(question: Dict, user_answer: str) -> bool:
+            async with semaphore:
+                return await loop.run_in_executor(None, self.check_answer, question, user_answer)
+
+        return await asyncio.gather(*(check(question, user_answer) for question, user_answer in qa_pairs))
+
+    def check_answers(self, qa_pairs: List[Tuple[Dict, str]]) -> List[bool]:
+        """
+        Checks several answers at once, e.g. when grading a whole quiz.
+        Single-choice and judge answers are checked inline; subjective answers need an LLM judgment
+        each, so they are dispatched together instead of one round-trip after another.
+        When called from a thread that is already running an event loop (where asyncio.run is not allowed),
+        the subjective answers are checked one after another instead.
+
+        Args:
+            qa_pairs (List[Tuple[Dict, str]]): The questions and the user's answers to them.
+
+        Returns:
+            List[bool]: Whether each answer is correct, in the same order as `qa_pairs`.
+        """
+        results = [False] * len(qa_pairs)
+        subjective_positions = []
+        for i, (question, user_answer) in enumerate(qa_pairs):
+            if question.get('type') == 'subjective':
+                subjective_positions.append(i)
+            else:
+                results[i] = self.check_answer(question, user_answer)
+
+        if subjective_positions:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                judged = asyncio.run(self._check_batch([qa_pairs[i] for i in subjective_positions]))
+            else:
+                judged = [self.check_answer(*qa_pairs[i]) for i in subjective_positions]
+            for i, is_correct in zip(subjective_positions, judged):
+                results[i] = is_correct
+        return results
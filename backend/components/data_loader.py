@@ -1,15 +1,35 @@
 import os
-import json
-from typing import List, Dict, Any, Optional
+import shutil
+import orjson
+import fastjsonschema
+from typing import List, Dict, Any, Optional, Tuple
 import random
 
+# Chunk size used when streaming an uploaded file to disk
+_UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Required layout of a technical document: a list of sections, each with string idx, title and text.
+# Compiled once into plain Python code, so validation runs without walking a schema at call time.
+_validate_document = fastjsonschema.compile({
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'required': ['idx', 'title', 'text'],
+        'properties': {
+            'idx': {'type': 'string'},
+            'title': {'type': 'string'},
+            'text': {'type': 'string'},
+        },
+    },
+})
+
 class DataLoader:
     """
     Handles all file system operations related to raw documents and question banks.
     """
-    def __init__(self):
-        # Update paths to point to the new 'data' directory
-        self.base_data_dir = 'data'
+    def __init__(self, base_data_dir: str = 'data'):
+        # Update paths to point to the new 'data' directory (overridable, e.g. a temporary directory in tests)
+        self.base_data_dir = base_data_dir
         self.raw_file_dir = os.path.join(self.base_data_dir, 'raw_files') # Changed from 'raw_file'
         self.question_dataset_dir = os.path.join(self.base_data_dir, 'question_dataset')
 
@@ -17,6 +37,31 @@ class DataLoader:
         os.makedirs(self.raw_file_dir, exist_ok=True)
         os.makedirs(self.question_dataset_dir, exist_ok=True)
 
+        # Parsed JSON files keyed by path, stored together with the mtime they were read at
+        self._file_cache: Dict[str, Tuple[int, List[Dict]]] = {}
+
+    def _load_json_file(self, file_path: str) -> List[Dict]:
+        """
+        Loads and parses a JSON file, reusing the parsed content while the file's mtime is unchanged.
+
+        Args:
+            file_path (str): The full path to the JSON file.
+
+        Returns:
+            List[Dict]: A shallow copy of the parsed content, so callers can reorder or extend it freely.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            orjson.JSONDecodeError: If the file is not valid JSON.
+        """
+        mtime = os.stat(file_path).st_mtime_ns
+        cached = self._file_cache.get(file_path)
+        if cached is None or cached[0] != mtime:
+            with open(file_path, 'rb') as f:
+                cached = (mtime, orjson.loads(f.read()))
+            self._file_cache[file_path] = cached
+        return list(cached[1])
+
     def validate_json_format(self, data: List[Dict]) -> bool:
         """
         Validates if the JSON file content adheres to the required format for technical documents.
@@ -28,21 +73,10 @@ class DataLoader:
             bool: True if the format is valid, False otherwise.
         """
         try:
-            if not isinstance(data, list):
-                return False
-
-            for item in data:
-                if not isinstance(item, dict):
-                    return False
-
-                # Check for required fields and their types
-                required_fields = ['idx', 'title', 'text']
-                for field in required_fields:
-                    if field not in item:
-                        return False
-                    if not isinstance(item[field], str):
-                        return False
+            _validate_document(data)
             return True
+        except fastjsonschema.JsonSchemaException:
+            return False
         except Exception as e:
             print(f"Error validating JSON format: {e}")
             return False
@@ -52,16 +86,35 @@ class DataLoader:
         Saves an uploaded file to the raw_files directory.
 
         Args:
-            uploaded_file: The uploaded file object from Streamlit.
+            uploaded_file: The uploaded file object from Streamlit (a seekable binary file-like object with a name).
 
         Returns:
             str: The full path to the saved file.
         """
         file_path = os.path.join(self.raw_file_dir, uploaded_file.name)
+        # The upload may already have been read for validation, so copy from the start.
+        # Copying in chunks avoids materializing a second full-size bytes object.
+        uploaded_file.seek(0)
         with open(file_path, 'wb') as f:
-            f.write(uploaded_file.getvalue())
+            shutil.copyfileobj(uploaded_file, f, _UPLOAD_COPY_CHUNK_SIZE)
+        self._file_cache.pop(file_path, None)
         return file_path
 
+    def _list_json_files(self, directory: str) -> List[str]:
+        """
+        Lists the JSON files in a directory, skipping hidden ones.
+        os.scandir reports the entry type from the directory listing itself, so no extra stat call is made per file.
+
+        Args:
+            directory (str): The directory to list.
+
+        Returns:
+            List[str]: A sorted list of filenames ending in '.json'.
+        """
+        with os.scandir(directory) as entries:
+            return sorted(entry.name for entry in entries
+                          if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.is_file())
+
     def get_uploaded_files(self) -> List[str]:
         """
         Retrieves a list of all JSON files in the raw_files directory.
@@ -70,11 +123,7 @@ class DataLoader:
             List[str]: A sorted list of filenames.
         """
         try:
-            files = []
-            for filename in os.listdir(self.raw_file_dir):
-                if filename.endswith('.json'):
-                    files.append(filename)
-            return sorted(files)
+            return self._list_json_files(self.raw_file_dir)
         except Exception as e:
             print(f"Error getting uploaded files: {e}")
             return []
@@ -87,12 +136,7 @@ class DataLoader:
             List[str]: A sorted list of question bank names (without extension).
         """
         try:
-            banks = []
-            for filename in os.listdir(self.question_dataset_dir):
-                if filename.endswith('.json'):
-                    bank_name = filename[:-5] # Remove .json extension
-                    banks.append(bank_name)
-            return sorted(banks)
+            return [filename[:-5] for filename in self._list_json_files(self.question_dataset_dir)] # Remove .json extension
         except Exception as e:
             print(f"Error getting question banks: {e}")
             return []
@@ -109,12 +153,11 @@ class DataLoader:
         """
         file_path = os.path.join(self.raw_file_dir, filename)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self._load_json_file(file_path)
         except FileNotFoundError:
             print(f"Document file not found: {file_path}")
             return []
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             print(f"Error decoding JSON from document file: {file_path}")
             return []
         except Exception as e:
@@ -134,9 +177,8 @@ class DataLoader:
         bank_path = os.path.join(self.question_dataset_dir, f"{bank_name_without_ext}.json")
         if os.path.exists(bank_path):
             try:
-                with open(bank_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
+                return self._load_json_file(bank_path)
+            except orjson.JSONDecodeError:
                 print(f"Warning: Question bank {bank_path} is corrupted, returning empty list.")
                 return []
             except Exception as e:
@@ -156,12 +198,19 @@ class DataLoader:
             str: The full path to the saved question bank file.
         """
         question_path = os.path.join(self.question_dataset_dir, question_filename)
+        # Write to a temporary file and swap it in, so a crash mid-write never leaves a truncated bank behind
+        temp_path = question_path + '.tmp'
         try:
-            with open(question_path, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, ensure_ascii=False, indent=2)
+            # orjson writes UTF-8 bytes directly, so non-ASCII text is kept as-is without escaping
+            with open(temp_path, 'wb') as f:
+                f.write(orjson.dumps(questions, option=orjson.OPT_INDENT_2))
+            os.replace(temp_path, question_path)
+            self._file_cache.pop(question_path, None)
             return question_path
         except Exception as e:
             print(f"Error saving question bank {question_filename}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return ""
 
     def load_questions_for_quiz(self, bank_name: str, count: int) -> List[Dict]:
@@ -175,10 +224,10 @@ class DataLoader:
         Returns:
             List[Dict]: A list of randomly selected questions, or an empty list if loading fails.
         """
+        bank_path = os.path.join(self.question_dataset_dir, f"{bank_name}.json")
         try:
-            bank_path = os.path.join(self.question_dataset_dir, f"{bank_name}.json")
-            with open(bank_path, 'r', encoding='utf-8') as f:
-                all_questions = json.load(f)
+            # Reuses the parsed bank while the file is unchanged, so repeated quizzes skip the read and parse
+            all_questions = self._load_json_file(bank_path)
 
             # Randomly select questions, ensuring not to select more than available
             selected_questions = random.sample(all_questions, min(count, len(all_questions)))
@@ -186,7 +235,7 @@ class DataLoader:
         except FileNotFoundError:
             print(f"Question bank file not found: {bank_path}")
             return []
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             print(f"Error decoding JSON from question bank file: {bank_path}")
             return []
         except Exception as e:
@@ -0,0 +1,145 @@
+import re
+import orjson
+from typing import Any, List, Optional, Tuple
+
+# Characters that matter for finding the end of a JSON object / array; everything else is skipped in C
+_STRUCTURAL_RE = {
+    '{': re.compile(r'[{}"\\]'),
+    '[': re.compile(r'[\[\]"\\]'),
+}
+
+def extract_json_block(text: str, opener: str = '{') -> Optional[str]:
+    """
+    Extracts the first complete JSON object or array from free-form text (e.g., an LLM response).
+    Scans once from the first `opener`, tracking bracket depth and ignoring brackets inside string
+    literals, and stops as soon as the block is closed. Unlike a greedy regex, trailing prose or a
+    second JSON fragment is never swallowed, and there is no backtracking.
+
+    Args:
+        text (str): The text to search.
+        opener (str): '{' to extract an object, '[' to extract an array.
+
+    Returns:
+        Optional[str]: The JSON block, or None if no block starts or the first one is never closed.
+    """
+    start = text.find(opener)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped_pos = -1 # Position of the character following a backslash inside a string
+    for match in _STRUCTURAL_RE[opener].finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == '\\':
+                escaped_pos = pos + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == opener:
+            depth += 1
+        elif ch != '\\':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def load_json_block(text: str, opener: str = '{') -> Optional[Any]:
+    """
+    Parses the first JSON object or array in free-form text.
+    Responses produced in JSON mode are a bare JSON document, so they are parsed directly;
+    only when that fails is the block located with `extract_json_block` first.
+
+    Args:
+        text (str): The text to parse.
+        opener (str): '{' to parse an object, '[' to parse an array.
+
+    Returns:
+        Optional[Any]: The parsed JSON value, or None if the text contains no complete block.
+
+    Raises:
+        json.JSONDecodeError: If the located block is not valid JSON (orjson's error subclasses it).
+    """
+    stripped = text.strip()
+    if stripped.startswith(opener):
+        try:
+            return orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
+    json_str = extract_json_block(text, opener)
+    return orjson.loads(json_str) if json_str else None
+
+class JsonObjectStreamParser:
+    """
+    Incrementally parses a JSON object that arrives in chunks (e.g., streamed LLM tokens).
+    Each top-level "key": value member is reported as soon as it is complete, without waiting for the
+    rest of the object. Text before the opening brace is ignored; text after the closing brace is dropped.
+    """
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0 # Next buffer position to scan
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = -1 # Buffer position where the current top-level member begins
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consumes the next chunk of text.
+
+        Args:
+            chunk (str): The next piece of the streamed text.
+
+        Returns:
+            List[Tuple[str, Any]]: The top-level members completed by this chunk, in order.
+
+        Raises:
+            json.JSONDecodeError: If a completed member is not valid JSON.
+        """
+        if self.done:
+            return []
+        self._buffer += chunk
+        members = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+                if self._depth == 1:
+                    if ch != '{':
+                        self._depth = 0 # Only an object can carry members; keep looking
+                        continue
+                    self._member_start = i + 1
+            elif ch in '}]' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._append_member(members, buffer[self._member_start:i])
+                    self.done = True
+                    break
+            elif ch == ',' and self._depth == 1:
+                self._append_member(members, buffer[self._member_start:i])
+                self._member_start = i + 1
+        self._pos = len(buffer)
+        return members
+
+    @staticmethod
+    def _append_member(members: List[Tuple[str, Any]], text: str):
+        """Parses one `"key": value` member and appends it, skipping empty text (e.g., `{}`)."""
+        if text.strip():
+            members.extend(orjson.loads('{' + text + '}').items())
@@ -1,195 +1,510 @@
-# This is local api version of llm_connector.py, and if use this version, .env should be adapted.
+# LLM access for question generation and answer judging. The service is picked with LLM_PROVIDER
+# ('openai' for OpenAI-compatible / local endpoints, 'dashscope' for Bailian); .env should be adapted to it.
 
 import os
-import json
 import re
-from typing import Dict, Optional, Tuple
-from dotenv import load_dotenv
-import openai
+import json
+import logging
+import orjson
+import hashlib
+import threading
+import unicodedata
+import fastjsonschema
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from rapidfuzz import fuzz
+from backend.components.semantic_cache import SemanticCache
+from backend.components.json_utils import load_json_block, JsonObjectStreamParser
+from backend.components.llm_providers import LLMProvider, create_provider
+
+# Load environment variables from .env file, unless the environment is already set up (LLM_SKIP_DOTENV=1)
+if os.getenv('LLM_SKIP_DOTENV') != '1':
+    from dotenv import load_dotenv
+    load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Fields each parsed question must contain, per question type, in output order
+_SCHEMAS = {
+    'single_choice': ('question', 'options', 'answer'),
+    'judge': ('question', 'answer'),
+    'subjective': ('question', 'answer'),
+}
+
+# Shape of one question object per type, compiled once into plain Python checks. Beyond the required
+# fields this rejects wrongly typed values (e.g., options given as one string) before they reach a bank.
+_QUESTION_VALIDATORS = {
+    question_type: fastjsonschema.compile({
+        'type': 'object',
+        'required': list(fields),
+        'properties': {
+            'question': {'type': 'string', 'minLength': 1},
+            'options': {'type': 'array', 'items': {'type': 'string'}, 'minItems': 2},
+            # Judge answers sometimes come back as JSON booleans; check_answer accepts both spellings
+            'answer': {'type': ['string', 'boolean'] if question_type == 'judge' else 'string'},
+        },
+    })
+    for question_type, fields in _SCHEMAS.items()
+}
+
+def _is_valid_question(question_data: Any, question_type: str) -> bool:
+    """Checks a parsed question object against the schema of its type."""
+    try:
+        _QUESTION_VALIDATORS[question_type](question_data)
+        return True
+    except fastjsonschema.JsonSchemaException:
+        return False
+
+# Fallback question templates, filled from the document item with str.format_map
+_FALLBACK_SINGLE_CHOICE = "关于{title}，以下哪个说法是正确的？"
+_FALLBACK_JUDGE = "{title}的相关要求是明确规定的。"
+_FALLBACK_SUBJECTIVE = "请简要描述{title}的主要内容。"
+_FALLBACK_OPTIONS = (
+    "A. 符合相关技术规范要求",
+    "B. 不符合相关技术规范要求",
+    "C. 需要进一步确认"
+)
+
+# Instructions of the similarity judgment; a constant, so the request prefix is identical across calls
+_JUDGE_SYSTEM_PROMPT = """
+请判断用户给出的两个文本（正确答案与用户答案）的语义相似度，并给出一个0到100的相似度分数。如果相似度分数大于或等于用户给出的阈值，则认为它们是“足够接近”的。
+
+请以JSON格式返回结果，包含 'similarity_score' (整数) 和 'is_similar' (布尔值)。
+
+示例：
+{
+    "similarity_score": 85,
+    "is_similar": true
+}
+"""
+
+# Longest prompt sent to the LLM (about 6K tokens of Chinese text). Longer prompts, e.g. from a whole document
+# ending up in one section, are cut in the middle: the head keeps the request, the tail the end of the context.
+_MAX_PROMPT_CHARS = 24000
+_PROMPT_HEAD_CHARS = 2000
+_PROMPT_CUT_MARKER = "\n……（内容过长，已省略）……\n"
+
+# The verdict is a tiny JSON object, so a short response budget is plenty and caps the worst case
+_JUDGE_MAX_TOKENS = 96
+
+# Answers this close to the correct answer, after normalization, are accepted without asking the LLM
+_LEXICAL_ACCEPT_SCORE = 95
+_NON_WORD_RE = re.compile(r'[\W_]+')
 
-# Load environment variables from .env file
-load_dotenv()
+def _normalize_answer(text: str) -> str:
+    """Folds width and case and drops whitespace and punctuation, so only the wording is compared."""
+    return _NON_WORD_RE.sub('', unicodedata.normalize('NFKC', text).lower())
+
+def _lexical_judgment(correct_answer: str, user_answer: str, similarity_threshold: int) -> Optional[Tuple[bool, float]]:
+    """
+    Judges an answer locally when it is (nearly) a copy of the correct answer.
+    A low lexical score is not conclusive - a paraphrase can share few characters with the reference -
+    so only the accepting side is decided here; everything else returns None and goes to the LLM.
+    """
+    correct, user = _normalize_answer(correct_answer), _normalize_answer(user_answer)
+    if not user:
+        return (False, 0.0) if correct else None
+    if user == correct:
+        return True, 100.0
+    score = fuzz.ratio(correct, user)
+    if score >= max(_LEXICAL_ACCEPT_SCORE, similarity_threshold):
+        return True, score
+    return None
 
 class LLMConnector:
     """
     Handles connection to the Large Language Model (LLM) and text generation.
+    Requests go through a provider (see llm_providers.py); response caching, parsing, fallback questions
+    and answer judging are shared by all providers.
     """
-    def __init__(self):
-        self.api_key = os.getenv('OPENAI_API_KEY', 'sk-no-key-required')
-        self.base_url = os.getenv('OPENAI_API_BASE', 'http://localhost:8000/v1')
-        self.model_name = os.getenv('OPENAI_MODEL_NAME', 'Qwen2.5-7B-Instruct')
+    def __init__(self, provider: Optional[str] = None):
+        """
+        Args:
+            provider (Optional[str]): The provider to use ('openai' or 'dashscope').
+                                      Defaults to the LLM_PROVIDER environment variable, else 'openai'.
+        """
+        self.provider: LLMProvider = create_provider(provider or os.getenv('LLM_PROVIDER', 'openai'))
+        self.model_name = self.provider.model_name
 
-        try:
-            self.client = openai.OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url,
-            )
-            print(f"LLMConnector initialized with base_url: {self.base_url}, model: {self.model_name}")
-        except Exception as e:
-            print(f"Error initializing OpenAI client: {e}")
-            self.client = None
+        # Responses keyed by a hash of everything that determines them, shared across threads
+        self._response_cache: Dict[str, str] = {}
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        # Subjective-answer verdicts, reused for paraphrases of an already judged answer
+        self.judgment_cache = SemanticCache()
+        self.max_prompt_chars = _MAX_PROMPT_CHARS
 
+    def _limit_prompt(self, prompt: str) -> str:
+        """
+        Shortens a prompt that exceeds `max_prompt_chars` by cutting out its middle, so a runaway input
+        cannot blow the token budget or stall the server on a huge prefill.
 
-    def generate_text(self, prompt: str) -> Optional[str]:
+        Args:
+            prompt (str): The input prompt for the LLM.
+
+        Returns:
+            str: The prompt itself, or its head and tail joined by a marker if it was too long.
+        """
+        if len(prompt) <= self.max_prompt_chars:
+            return prompt
+        head = min(_PROMPT_HEAD_CHARS, self.max_prompt_chars // 2)
+        tail = self.max_prompt_chars - head - len(_PROMPT_CUT_MARKER)
+        logger.warning("Prompt of %s characters exceeds the limit of %s and was shortened.", len(prompt), self.max_prompt_chars)
+        return prompt[:head] + _PROMPT_CUT_MARKER + (prompt[-tail:] if tail > 0 else '')
+
+    def _cache_key(self, prompt: str, json_mode: bool, system_prompt: Optional[str] = None,
+                   max_tokens: Optional[int] = None) -> str:
+        """Hashes the provider settings, output mode, response budget and messages into a response cache key."""
+        payload = orjson.dumps([*self.provider.cache_namespace, json_mode, max_tokens, system_prompt, prompt])
+        return hashlib.sha256(payload).hexdigest()
+
+    def _get_cached(self, cache_key: str) -> Optional[str]:
+        """Returns the cached response for a key, or None, and records the hit or miss."""
+        with self._cache_lock:
+            cached = self._response_cache.get(cache_key)
+            self.cache_stats['hits' if cached is not None else 'misses'] += 1
+        return cached
+
+    def _store_cached(self, cache_key: str, content: str):
+        """Stores a response in the cache."""
+        with self._cache_lock:
+            self._response_cache[cache_key] = content
+
+    def generate_text(self, prompt: str, use_cache: bool = True, json_mode: bool = False,
+                      system_prompt: Optional[str] = None, max_tokens: Optional[int] = None) -> Optional[str]:
         """
         Calls the LLM to generate text based on the given prompt.
+        Identical requests are answered from an in-memory cache instead of calling the LLM again.
 
         Args:
             prompt (str): The input prompt for the LLM.
+            use_cache (bool): Whether to reuse and store responses. Pass False when a fresh sample is wanted.
+            json_mode (bool): Whether to ask the server to return a single JSON object.
+                              The prompt must describe the expected object.
+            system_prompt (Optional[str]): Instructions sent as a system message ahead of the prompt. Keeping
+                                           the static part of a prompt here lets the server cache its prefix.
+            max_tokens (Optional[int]): The maximum length of the response. Generation time grows with the
+                                        response, so callers that expect short output should set it.
+                                        Defaults to the provider's limit.
 
         Returns:
             Optional[str]: The generated text content from the LLM, or None if an error occurs.
         """
-        if not self.client:
-            print("LLM client not initialized.")
-            return None
-        try:
-            # 确保输入是UTF-8编码
-            # prompt = str(prompt).encode('utf-8').decode('utf-8')
-
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "user", "content": prompt} # 使用处理过的提示词
-                ],
-                temperature=0.1,
-                max_tokens=2048,
-            )
-
-            if response.choices and response.choices[0].message and response.choices[0].message.content:
-                return response.choices[0].message.content
-            else:
-                print(f"LLM generation returned no content.")
-                return None
-        except openai.APIConnectionError as e:
-            print(f"Could not connect to OpenAI API: {e}")
-            print(f"Please ensure your local LLM server is running at {self.base_url}")
-            return None
-        except openai.RateLimitError as e:
-            print(f"OpenAI API request exceeded rate limit: {e}")
-            return None
-        except openai.APIStatusError as e:
-            print(f"OpenAI API returned an error status: {e.status_code} - {e.response}")
-            return None
-        except Exception as e:
-            print(f"Error during LLM text generation: {e}")
-            return None
+        prompt = self._limit_prompt(prompt)
+        if use_cache:
+            cache_key = self._cache_key(prompt, json_mode, system_prompt, max_tokens)
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                return cached
+        content = self.provider.generate_text(prompt, json_mode, system_prompt, max_tokens)
+        if content and use_cache:
+            self._store_cached(cache_key, content)
+        return content
+
+    def generate_text_many(self, prompts: List[str], max_concurrency: int = 16, use_cache: bool = True,
+                           json_mode: bool = False, system_prompts: Optional[List[Optional[str]]] = None,
+                           max_tokens: Optional[int] = None) -> List[Optional[str]]:
+        """
+        Generates text for several prompts concurrently, so a batch takes about as long as its slowest request
+        instead of the sum of all of them. Cached prompts are answered without a request.
 
-    def parse_single_choice_json(self, content: str) -> Optional[Dict]:
+        Args:
+            prompts (List[str]): The input prompts for the LLM.
+            max_concurrency (int): The maximum number of requests in flight at once.
+            use_cache (bool): Whether to reuse and store responses. Pass False when fresh samples are wanted.
+            json_mode (bool): Whether to request a single JSON object for every prompt.
+            system_prompts (Optional[List[Optional[str]]]): A system message for each prompt (None for none), in prompt order.
+            max_tokens (Optional[int]): The maximum length of each response. Defaults to the provider's limit.
+
+        Returns:
+            List[Optional[str]]: The generated text for each prompt (None where generation failed), in prompt order.
+        """
+        if system_prompts is None:
+            system_prompts = [None] * len(prompts)
+        prompts = [self._limit_prompt(prompt) for prompt in prompts]
+        results: List[Optional[str]] = [None] * len(prompts)
+        cache_keys: List[Optional[str]] = [None] * len(prompts)
+        pending = []
+        for i, (prompt, system_prompt) in enumerate(zip(prompts, system_prompts)):
+            if use_cache:
+                cache_keys[i] = self._cache_key(prompt, json_mode, system_prompt, max_tokens)
+                results[i] = self._get_cached(cache_keys[i])
+            if results[i] is None:
+                pending.append(i)
+        if not pending:
+            return results
+
+        generated = self.provider.generate_many(
+            [prompts[i] for i in pending], [system_prompts[i] for i in pending], max_concurrency, json_mode, max_tokens
+        )
+        for i, content in zip(pending, generated):
+            results[i] = content
+            if content and use_cache:
+                self._store_cached(cache_keys[i], content)
+        return results
+
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Streams the LLM response for a prompt, so callers can show or process it before generation finishes.
+        Streamed responses bypass the response cache.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+
+        Yields:
+            str: Each non-empty piece of the response, in order. Nothing is yielded if the request fails.
+        """
+        stream_text = getattr(self.provider, 'stream_text', None)
+        if stream_text is None:
+            logger.error("Streaming is not supported by the %s provider.", type(self.provider).__name__)
+            return
+        yield from stream_text(self._limit_prompt(prompt))
+
+    def generate_structured_stream(self, prompt: str, required_keys: Iterable[str] = ()) -> Iterator[Tuple[str, Any]]:
+        """
+        Streams the LLM response for a prompt that asks for a JSON object and yields each top-level field
+        as soon as it is complete, so callers can start using e.g. the question text before the answer is generated.
+        Once every key in `required_keys` has been delivered, the stream is closed and generation stops.
+
+        Args:
+            prompt (str): The input prompt for the LLM, describing the expected JSON object.
+            required_keys (Iterable[str]): The keys after which the rest of the response is not needed.
+
+        Yields:
+            Tuple[str, Any]: Each completed (key, value) pair, in the order the LLM produced them.
+        """
+        stream_text = getattr(self.provider, 'stream_text', None)
+        if stream_text is None:
+            logger.error("Streaming is not supported by the %s provider.", type(self.provider).__name__)
+            return
+        pending = set(required_keys)
+        stop_when_complete = bool(pending)
+        parser = JsonObjectStreamParser()
+        stream = stream_text(self._limit_prompt(prompt))
         try:
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                question_data = json.loads(json_str)
-                if all(k in question_data for k in ['question', 'options', 'answer']):
-                    return {
-                        'type': 'single_choice',
-                        'question': question_data['question'],
-                        'options': question_data['options'],
-                        'answer': question_data['answer']
-                    }
+            for text in stream:
+                for key, value in parser.feed(text):
+                    yield key, value
+                    pending.discard(key)
+                if parser.done or (stop_when_complete and not pending):
+                    break
         except json.JSONDecodeError:
-            print("JSONDecodeError: Could not parse single choice question from LLM response.")
-        except Exception as e:
-            print(f"Error parsing single choice JSON: {e}")
-        return None
+            logger.warning("JSONDecodeError: Could not parse streamed LLM response.")
+        finally:
+            # Stops generation on the server when the caller has what it needs or stops iterating early
+            stream.close()
+
+    def generate_text_batch_offline(self, prompts: List[str], completion_window: str = '24h',
+                                    poll_interval: float = 5.0, max_poll_interval: float = 300.0) -> List[Optional[str]]:
+        """
+        Generates text for many prompts through the OpenAI Batch API, for large offline jobs where latency
+        does not matter. Batch requests are billed at a discount and do not count against the online rate limit.
+        Blocks until the batch has finished, polling with exponential backoff.
+        Only available with providers that support batch jobs ('openai').
 
-    def parse_judge_json(self, content: str) -> Optional[Dict]:
+        Args:
+            prompts (List[str]): The input prompts for the LLM.
+            completion_window (str): The time frame within which the batch must be processed.
+            poll_interval (float): The initial delay between status checks, in seconds.
+            max_poll_interval (float): The upper bound for the delay between status checks, in seconds.
+
+        Returns:
+            List[Optional[str]]: The generated text for each prompt (None where generation failed), in prompt order.
+        """
+        generate_batch_offline = getattr(self.provider, 'generate_batch_offline', None)
+        if generate_batch_offline is None:
+            logger.error("Offline batch jobs are not supported by the %s provider.", type(self.provider).__name__)
+            return [None] * len(prompts)
+        prompts = [self._limit_prompt(prompt) for prompt in prompts]
+        return generate_batch_offline(prompts, completion_window, poll_interval, max_poll_interval)
+
+    @staticmethod
+    def _parse_question_json(content: str, question_type: str) -> Optional[Dict]:
+        """
+        Parses the LLM's raw output string to extract one question of the given type in JSON format.
+
+        Args:
+            content (str): The raw string content from the LLM.
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+
+        Returns:
+            Optional[Dict]: A dictionary containing 'type' and the type's required fields if parsing is successful,
+                            otherwise None.
+        """
         try:
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                question_data = json.loads(json_str)
-                if all(k in question_data for k in ['question', 'answer']):
-                    return {
-                        'type': 'judge',
-                        'question': question_data['question'],
-                        'answer': question_data['answer']
-                    }
+            # Parse the content directly, or the first complete JSON object within it
+            question_data = load_json_block(content, '{')
+            # Validate the required fields and their types
+            if question_data is not None and _is_valid_question(question_data, question_type):
+                return {'type': question_type, **{k: question_data[k] for k in _SCHEMAS[question_type]}}
         except json.JSONDecodeError:
-            print("JSONDecodeError: Could not parse judge question from LLM response.")
+            logger.warning("JSONDecodeError: Could not parse %s question from LLM response.", question_type)
         except Exception as e:
-            print(f"Error parsing judge JSON: {e}")
+            logger.exception("Error parsing %s JSON: %s", question_type, e)
         return None
 
-    def parse_subjective_json(self, content: str) -> Optional[Dict]:
+    @staticmethod
+    def parse_single_choice_json(content: str) -> Optional[Dict]:
+        """Parses a single-choice question ('question', 'options', 'answer') from the LLM's raw output."""
+        return LLMConnector._parse_question_json(content, 'single_choice')
+
+    @staticmethod
+    def parse_judge_json(content: str) -> Optional[Dict]:
+        """Parses a judge question ('question', 'answer') from the LLM's raw output."""
+        return LLMConnector._parse_question_json(content, 'judge')
+
+    @staticmethod
+    def parse_subjective_json(content: str) -> Optional[Dict]:
+        """Parses a subjective question ('question', 'answer') from the LLM's raw output."""
+        return LLMConnector._parse_question_json(content, 'subjective')
+
+    @staticmethod
+    def parse_questions_json(content: str, question_type: str) -> List[Dict]:
+        """
+        Parses the LLM's raw output string to extract a JSON array of questions of one type.
+        A bare question object (common when only one question was asked for) counts as a one-element array,
+        and an object wrapping the array as {"questions": [...]} is unwrapped.
+        Array elements that are missing required fields or hold wrongly typed values are dropped.
+
+        Args:
+            content (str): The raw string content from the LLM.
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+
+        Returns:
+            List[Dict]: The parsed questions, each tagged with 'type', or an empty list if parsing fails.
+        """
+        fields = _SCHEMAS[question_type]
         try:
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                question_data = json.loads(json_str)
-                if all(k in question_data for k in ['question', 'answer']):
-                    return {
-                        'type': 'subjective',
-                        'question': question_data['question'],
-                        'answer': question_data['answer']
-                    }
+            questions_data = None
+            first_object = content.find('{')
+            first_array = content.find('[')
+            if first_object != -1 and (first_array == -1 or first_object < first_array):
+                # An object comes first: a single question, or the array wrapped in an object.
+                # Searching for '[' here would land on an array inside it (e.g. a question's options).
+                try:
+                    question_object = load_json_block(content, '{')
+                except json.JSONDecodeError:
+                    question_object = None
+                if isinstance(question_object, dict):
+                    wrapped = question_object.get('questions')
+                    questions_data = wrapped if isinstance(wrapped, list) else [question_object]
+            if questions_data is None:
+                # Parse the content directly, or the first complete JSON array within it
+                questions_data = load_json_block(content, '[')
+            if questions_data is not None:
+                return [
+                    {'type': question_type, **{k: question_data[k] for k in fields}}
+                    for question_data in questions_data
+                    if _is_valid_question(question_data, question_type)
+                ]
         except json.JSONDecodeError:
-            print("JSONDecodeError: Could not parse subjective question from LLM response.")
+            logger.warning("JSONDecodeError: Could not parse %s questions from LLM response.", question_type)
         except Exception as e:
-            print(f"Error parsing subjective JSON: {e}")
-        return None
+            logger.exception("Error parsing %s questions JSON: %s", question_type, e)
+        return []
+
+    @staticmethod
+    def generate_fallback_single_choice(item: Dict) -> Dict:
+        """
+        Generates a fallback single-choice question if LLM generation fails or produces malformed output.
 
-    def generate_fallback_single_choice(self, item: Dict) -> Dict:
+        Args:
+            item (Dict): The document item used as context for the question.
+
+        Returns:
+            Dict: A dictionary representing a simple single-choice question.
+        """
         return {
             'type': 'single_choice',
-            'question': f"关于{item['title']}，以下哪个说法是正确的？",
-            'options': [
-                "A. 符合相关技术规范要求",
-                "B. 不符合相关技术规范要求",
-                "C. 需要进一步确认"
-            ],
+            'question': _FALLBACK_SINGLE_CHOICE.format_map(item),
+            'options': list(_FALLBACK_OPTIONS), # Questions are JSON data, so callers get their own list
             'answer': "A"
         }
 
-    def generate_fallback_judge(self, item: Dict) -> Dict:
+    @staticmethod
+    def generate_fallback_judge(item: Dict) -> Dict:
+        """
+        Generates a fallback judge question if LLM generation fails or produces malformed output.
+
+        Args:
+            item (Dict): The document item used as context for the question.
+
+        Returns:
+            Dict: A dictionary representing a simple judge question.
+        """
         return {
             'type': 'judge',
-            'question': f"{item['title']}的相关要求是明确规定的。",
+            'question': _FALLBACK_JUDGE.format_map(item),
             'answer': "正确"
         }
 
-    def generate_fallback_subjective(self, item: Dict) -> Dict:
+    @staticmethod
+    def generate_fallback_subjective(item: Dict) -> Dict:
+        """
+        Generates a fallback subjective question if LLM generation fails or produces malformed output.
+
+        Args:
+            item (Dict): The document item used as context for the question.
+
+        Returns:
+            Dict: A dictionary representing a simple subjective question.
+        """
         return {
             'type': 'subjective',
-            'question': f"请简要描述{item['title']}的主要内容。",
-            'answer': item['text']
+            'question': _FALLBACK_SUBJECTIVE.format_map(item),
+            'answer': item['text'] # Use the original text as a simple fallback answer
         }
 
     def judge_subjective_answer_with_llm(self, correct_answer: str, user_answer: str, similarity_threshold: int = 70) -> Tuple[bool, Optional[float]]:
-        prompt = f"""
-请判断以下两个文本的语义相似度，并给出一个0到100的相似度分数。如果相似度分数大于或等于{similarity_threshold}分，则认为它们是“足够接近”的。
+        """
+        Uses the LLM to judge the similarity between the correct answer and the user's subjective answer.
 
-正确答案: {correct_answer}
-用户答案: {user_answer}
+        Args:
+            correct_answer (str): The expected correct answer.
+            user_answer (str): The user's provided answer.
+            similarity_threshold (int): The percentage threshold (0-100) for considering answers similar.
 
-请以JSON格式返回结果，包含 'similarity_score' (整数) 和 'is_similar' (布尔值)。
+        Returns:
+            Tuple[bool, Optional[float]]: A tuple where the first element is True if similar, False otherwise,
+                                          and the second element is the estimated similarity score (0-100) if available, else None.
+        """
+        # Copies of the correct answer need no LLM round-trip
+        lexical = _lexical_judgment(correct_answer, user_answer, similarity_threshold)
+        if lexical is not None:
+            logger.debug("Judged similarity locally: Score=%s, Is_similar=%s", lexical[1], lexical[0])
+            return lexical
 
-示例：
-{{
-    "similarity_score": 85,
-    "is_similar": true
-}}
+        prompt = f"""
+阈值: {similarity_threshold}
+正确答案: {correct_answer}
+用户答案: {user_answer}
 """
-        content = self.generate_text(prompt)
+        # Verdicts only carry over between answers to the same correct answer under the same threshold
+        cache_namespace = (correct_answer, similarity_threshold)
+        cached, user_vector = self.judgment_cache.get(cache_namespace, user_answer)
+        if cached is not None:
+            logger.debug("Reused cached similarity judgment: Score=%s, Is_similar=%s", cached[1], cached[0])
+            return cached
+
+        content = self.generate_text(prompt, json_mode=True, system_prompt=_JUDGE_SYSTEM_PROMPT, max_tokens=_JUDGE_MAX_TOKENS)
         if content:
             try:
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    judgment = json.loads(json_str)
+                judgment = load_json_block(content, '{')
+                if judgment is not None:
                     score = judgment.get('similarity_score')
                     is_similar = judgment.get('is_similar')
 
                     if isinstance(score, int) and isinstance(is_similar, bool):
-                        print(f"LLM judged similarity: Score={score}, Is_similar={is_similar}")
+                        logger.debug("LLM judged similarity: Score=%s, Is_similar=%s", score, is_similar)
+                        self.judgment_cache.add(cache_namespace, user_answer, (is_similar, score), user_vector)
                         return is_similar, score
-                    elif isinstance(score, int):
-                        print(f"LLM judged similarity: Score={score}")
+                    elif isinstance(score, int): # If is_similar is not explicitly returned, use score directly
+                        logger.debug("LLM judged similarity: Score=%s", score)
+                        self.judgment_cache.add(cache_namespace, user_answer, (score >= similarity_threshold, score), user_vector)
                         return score >= similarity_threshold, score
             except json.JSONDecodeError:
-                print("JSONDecodeError: Could not parse LLM similarity judgment.")
+                logger.warning("JSONDecodeError: Could not parse LLM similarity judgment.")
             except Exception as e:
-                print(f"Error parsing LLM similarity judgment: {e}")
-        print("LLM failed to judge similarity, defaulting to False.")
-        return False, None
\ No newline at end of file
+                logger.exception("Error parsing LLM similarity judgment: %s", e)
+        logger.warning("LLM failed to judge similarity, defaulting to False.")
+        return False, None # Fallback if LLM judgment fails
+
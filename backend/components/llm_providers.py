@@ -0,0 +1,577 @@
+import os
+import json
+import logging
+import asyncio
+import importlib.util
+import inspect
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Protocol, Tuple
+import orjson
+
+if TYPE_CHECKING:
+    import httpx
+    import openai
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 lets concurrent requests share one connection per endpoint; httpx needs the optional h2 package for it
+_HTTP2 = importlib.util.find_spec('h2') is not None
+# Connection pool shared by all requests of a client, kept alive between calls
+_HTTP_MAX_CONNECTIONS = 64
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+# Same read timeout as the OpenAI SDK's default (long generations), but fail fast on unreachable endpoints
+_HTTP_TIMEOUT_SECONDS = 600.0
+_HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+# Connection attempts retried by the transport before a request fails
+_HTTP_CONNECT_RETRIES = 2
+
+class LLMProvider(Protocol):
+    """
+    The transport to one LLM service. Providers only send requests; caching, parsing and answer judging
+    live once in LLMConnector on top of them.
+    """
+    model_name: str
+    # Everything besides the messages that determines a response, used to key the response cache
+    cache_namespace: Tuple
+
+    def generate_text(self, prompt: str, json_mode: bool = False, system_prompt: Optional[str] = None,
+                      max_tokens: Optional[int] = None) -> Optional[str]:
+        ...
+
+    def generate_many(self, prompts: List[str], system_prompts: List[Optional[str]], max_concurrency: int,
+                      json_mode: bool = False, max_tokens: Optional[int] = None) -> List[Optional[str]]:
+        ...
+
+class OpenAIProvider:
+    """
+    Talks to one or more OpenAI-compatible endpoints (e.g., a local vLLM server).
+    Requests are spread over the endpoints round-robin, and endpoints that answer with a rate-limit error
+    are skipped for a while. Also supports streaming and the OpenAI Batch API.
+    """
+    def __init__(self):
+        # The SDK is imported on first construction, so the connector's helpers can be used without it
+        import openai
+
+        # Several endpoints / keys can be given as comma-separated lists; requests are spread over all of them.
+        # A single key is shared by every endpoint.
+        self.base_urls = [url.strip() for url in os.getenv('OPENAI_API_BASE', 'http://localhost:8000/v1').split(',') if url.strip()]
+        api_keys = [key.strip() for key in os.getenv('OPENAI_API_KEY', 'sk-no-key-required').split(',') if key.strip()]
+        self.api_keys = [api_keys[i % len(api_keys)] for i in range(len(self.base_urls))]
+        self.api_key = self.api_keys[0]
+        self.base_url = self.base_urls[0]
+        self.model_name = os.getenv('OPENAI_MODEL_NAME', 'Qwen2.5-7B-Instruct')
+        self.temperature = 0.1
+        self.max_tokens = 2048
+        self.cache_namespace = ('openai', self.model_name, self.temperature, self.max_tokens)
+        # Retries for rate-limited requests in generate_many, with exponential backoff
+        self.max_retries = 3
+        # Seconds an endpoint is skipped after it answered with a rate-limit error
+        self.rate_limit_cooldown = 30.0
+
+        # Round-robin position and per-endpoint cooldown deadlines (time.monotonic())
+        self._endpoint_lock = threading.Lock()
+        self._next_endpoint = 0
+        self._cooldown_until = [0.0] * len(self.base_urls)
+
+        # Background event loop that owns the async clients of generate_many, started on first use
+        self._async_lock = threading.Lock()
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_clients: List['openai.AsyncOpenAI'] = []
+
+        try:
+            # One connection pool serves every endpoint; connections are pooled per host
+            http_client = self._http_client()
+            self.clients = [
+                openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                for api_key, base_url in zip(self.api_keys, self.base_urls)
+            ]
+            self.client = self.clients[0]
+            logger.info("LLMConnector initialized with base_url: %s, model: %s", ', '.join(self.base_urls), self.model_name)
+        except Exception as e:
+            logger.exception("Error initializing OpenAI client: %s", e)
+            self.clients = []
+            self.client = None
+
+    @staticmethod
+    def _http_client(asynchronous: bool = False) -> 'httpx.Client | httpx.AsyncClient':
+        """
+        Builds the HTTP client handed to the OpenAI SDK: a keep-alive connection pool, HTTP/2 when available,
+        and transport-level retries of failed connection attempts.
+        """
+        import httpx
+        limits = httpx.Limits(max_connections=_HTTP_MAX_CONNECTIONS,
+                              max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS)
+        timeout = httpx.Timeout(_HTTP_TIMEOUT_SECONDS, connect=_HTTP_CONNECT_TIMEOUT_SECONDS)
+        if asynchronous:
+            transport = httpx.AsyncHTTPTransport(http2=_HTTP2, limits=limits, retries=_HTTP_CONNECT_RETRIES)
+            return httpx.AsyncClient(transport=transport, timeout=timeout)
+        transport = httpx.HTTPTransport(http2=_HTTP2, limits=limits, retries=_HTTP_CONNECT_RETRIES)
+        return httpx.Client(transport=transport, timeout=timeout)
+
+    def _async_runtime(self) -> Tuple[asyncio.AbstractEventLoop, List['openai.AsyncOpenAI']]:
+        """
+        Returns the background event loop and the async clients bound to it, starting them on first use.
+        Async clients can only be used on the loop they were created on, so one long-lived loop on a daemon
+        thread owns them; every batch runs there and reuses the same keep-alive connections.
+
+        Returns:
+            Tuple[asyncio.AbstractEventLoop, List[openai.AsyncOpenAI]]: The loop and one async client per endpoint.
+        """
+        with self._async_lock:
+            if self._async_loop is None:
+                import openai
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="openai-async-loop", daemon=True).start()
+
+                async def create_clients() -> List['openai.AsyncOpenAI']:
+                    http_client = self._http_client(asynchronous=True)
+                    return [
+                        openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                        for api_key, base_url in zip(self.api_keys, self.base_urls)
+                    ]
+
+                self._async_clients = asyncio.run_coroutine_threadsafe(create_clients(), loop).result()
+                self._async_loop = loop
+            return self._async_loop, self._async_clients
+
+    def _pick_endpoint(self) -> int:
+        """
+        Picks the next endpoint in round-robin order, skipping endpoints that are cooling down after a rate limit.
+        If every endpoint is cooling down, the one that becomes available first is used.
+
+        Returns:
+            int: The index of the endpoint (into base_urls / clients).
+        """
+        with self._endpoint_lock:
+            now = time.monotonic()
+            count = len(self.base_urls)
+            for offset in range(count):
+                index = (self._next_endpoint + offset) % count
+                if self._cooldown_until[index] <= now:
+                    self._next_endpoint = index + 1
+                    return index
+            return min(range(count), key=self._cooldown_until.__getitem__)
+
+    def _mark_rate_limited(self, index: int):
+        """Takes an endpoint out of the rotation for `rate_limit_cooldown` seconds."""
+        with self._endpoint_lock:
+            self._cooldown_until[index] = time.monotonic() + self.rate_limit_cooldown
+
+    def _completion_params(self, prompt: str, json_mode: bool, system_prompt: Optional[str] = None,
+                           max_tokens: Optional[int] = None) -> Dict:
+        """Builds the chat completion request shared by the sync and async clients."""
+        import openai
+        messages = [{"role": "user", "content": prompt}] # 使用处理过的提示词
+        if system_prompt:
+            # Static instructions go first, so servers with prefix caching can reuse their KV cache across calls
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return {
+            'model': self.model_name,
+            'messages': messages,
+            'temperature': self.temperature,
+            'max_tokens': max_tokens or self.max_tokens,
+            # JSON mode makes the whole response one JSON object, so parsing needs no extraction step
+            'response_format': {"type": "json_object"} if json_mode else openai.NOT_GIVEN,
+        }
+
+    def _extract_content(self, response) -> Optional[str]:
+        """Returns the message content of a chat completion, or None if it is empty."""
+        if response.choices and response.choices[0].message and response.choices[0].message.content:
+            return response.choices[0].message.content
+        logger.warning("LLM generation returned no content.")
+        return None
+
+    def _report_error(self, e: Exception):
+        """Logs a description of an error raised by the OpenAI client."""
+        import openai
+        if isinstance(e, openai.APIConnectionError):
+            logger.error("Could not connect to OpenAI API: %s", e)
+            logger.error("Please ensure your local LLM server is running at %s", self.base_url)
+        elif isinstance(e, openai.RateLimitError):
+            logger.warning("OpenAI API request exceeded rate limit: %s", e)
+        elif isinstance(e, openai.APIStatusError):
+            logger.error("OpenAI API returned an error status: %s - %s", e.status_code, e.response)
+        else:
+            logger.error("Error during LLM text generation: %s", e)
+
+    def generate_text(self, prompt: str, json_mode: bool = False, system_prompt: Optional[str] = None,
+                      max_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Sends one chat completion request. A rate-limited endpoint is skipped for a while and the request
+        moves on to the next one.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+            json_mode (bool): Whether to ask the server to return a single JSON object (OpenAI JSON mode).
+            system_prompt (Optional[str]): Instructions sent as a system message ahead of the prompt.
+            max_tokens (Optional[int]): The maximum length of the response. Defaults to the provider's limit.
+
+        Returns:
+            Optional[str]: The generated text content from the LLM, or None if an error occurs.
+        """
+        if not self.client:
+            logger.error("LLM client not initialized.")
+            return None
+        import openai
+        try:
+            # 确保输入是UTF-8编码
+            # prompt = str(prompt).encode('utf-8').decode('utf-8')
+
+            for _ in range(len(self.clients)):
+                endpoint = self._pick_endpoint()
+                try:
+                    response = self.clients[endpoint].chat.completions.create(**self._completion_params(prompt, json_mode, system_prompt, max_tokens))
+                except openai.RateLimitError as e:
+                    self._mark_rate_limited(endpoint)
+                    last_error = e
+                    continue
+                return self._extract_content(response)
+            self._report_error(last_error)
+            return None
+        except Exception as e:
+            self._report_error(e)
+            return None
+
+    async def _agenerate_text(self, clients: List['openai.AsyncOpenAI'], prompt: str, semaphore: asyncio.Semaphore,
+                              json_mode: bool, system_prompt: Optional[str], max_tokens: Optional[int]) -> Optional[str]:
+        """
+        Async counterpart of generate_text for one prompt of a batch.
+        Rate-limited requests are retried on the next endpoint, with exponential backoff, before giving up.
+
+        Args:
+            clients (List[openai.AsyncOpenAI]): The async clients on the background event loop, one per endpoint.
+            prompt (str): The input prompt for the LLM.
+            semaphore (asyncio.Semaphore): Caps the number of requests in flight; not held while backing off.
+            json_mode (bool): Whether to request a single JSON object.
+            system_prompt (Optional[str]): Instructions sent as a system message ahead of the prompt.
+            max_tokens (Optional[int]): The maximum length of the response. Defaults to the provider's limit.
+
+        Returns:
+            Optional[str]: The generated text content from the LLM, or None if an error occurs.
+        """
+        import openai
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._pick_endpoint()
+            try:
+                # Hold a concurrency slot only while the request is in flight, not during the backoff below
+                async with semaphore:
+                    response = await clients[endpoint].chat.completions.create(**self._completion_params(prompt, json_mode, system_prompt, max_tokens))
+                return self._extract_content(response)
+            except openai.RateLimitError as e:
+                self._mark_rate_limited(endpoint)
+                if attempt == self.max_retries:
+                    self._report_error(e)
+                    return None
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                self._report_error(e)
+                return None
+
+    def generate_many(self, prompts: List[str], system_prompts: List[Optional[str]], max_concurrency: int,
+                      json_mode: bool = False, max_tokens: Optional[int] = None) -> List[Optional[str]]:
+        """
+        Sends several chat completion requests concurrently on the provider's background event loop.
+        Batches share that loop's connection pool, so later batches reuse the connections of earlier ones.
+        Safe to call from several threads, and from threads that run an event loop of their own.
+
+        Args:
+            prompts (List[str]): The input prompts for the LLM.
+            system_prompts (List[Optional[str]]): A system message for each prompt (None for none), in prompt order.
+            max_concurrency (int): The maximum number of requests in flight at once.
+            json_mode (bool): Whether to request a single JSON object for every prompt.
+            max_tokens (Optional[int]): The maximum length of each response. Defaults to the provider's limit.
+
+        Returns:
+            List[Optional[str]]: The generated text for each prompt (None where generation failed), in prompt order.
+        """
+        if not self.client:
+            logger.error("LLM client not initialized.")
+            return [None] * len(prompts)
+        loop, clients = self._async_runtime()
+
+        async def generate_all() -> List[Optional[str]]:
+            # One semaphore per batch, so each caller's max_concurrency applies to its own prompts
+            semaphore = asyncio.Semaphore(max_concurrency)
+            return await asyncio.gather(*(
+                self._agenerate_text(clients, prompt, semaphore, json_mode, system_prompt, max_tokens)
+                for prompt, system_prompt in zip(prompts, system_prompts)
+            ))
+
+        return asyncio.run_coroutine_threadsafe(generate_all(), loop).result()
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Streams the response to a prompt. Closing the iterator early stops generation on the server.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+
+        Yields:
+            str: Each non-empty piece of the response, in order.
+        """
+        if not self.client:
+            logger.error("LLM client not initialized.")
+            return
+        import openai
+        endpoint = self._pick_endpoint()
+        try:
+            stream = self.clients[endpoint].chat.completions.create(**self._completion_params(prompt, False), stream=True)
+        except Exception as e:
+            if isinstance(e, openai.RateLimitError):
+                self._mark_rate_limited(endpoint)
+            self._report_error(e)
+            return
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            self._report_error(e)
+        finally:
+            stream.close()
+
+    def generate_batch_offline(self, prompts: List[str], completion_window: str = '24h',
+                               poll_interval: float = 5.0, max_poll_interval: float = 300.0) -> List[Optional[str]]:
+        """
+        Generates text for many prompts through the OpenAI Batch API. Blocks until the batch has finished,
+        polling with exponential backoff.
+
+        Args:
+            prompts (List[str]): The input prompts for the LLM.
+            completion_window (str): The time frame within which the batch must be processed.
+            poll_interval (float): The initial delay between status checks, in seconds.
+            max_poll_interval (float): The upper bound for the delay between status checks, in seconds.
+
+        Returns:
+            List[Optional[str]]: The generated text for each prompt (None where generation failed), in prompt order.
+        """
+        results: List[Optional[str]] = [None] * len(prompts)
+        if not self.client:
+            logger.error("LLM client not initialized.")
+            return results
+        if not prompts:
+            return results
+        import openai
+        try:
+            # One chat completion request per line; custom_id maps each output line back to its prompt
+            lines = []
+            for i, prompt in enumerate(prompts):
+                body = {k: v for k, v in self._completion_params(prompt, False).items() if v is not openai.NOT_GIVEN}
+                lines.append(json.dumps({"custom_id": f"r{i}", "method": "POST", "url": "/v1/chat/completions",
+                                         "body": body}, ensure_ascii=False))
+            input_file = self.client.files.create(
+                file=("batch_input.jsonl", "\n".join(lines).encode('utf-8')),
+                purpose="batch",
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=completion_window,
+            )
+            logger.info("Submitted batch %s with %s requests.", batch.id, len(prompts))
+
+            delay = poll_interval
+            while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+                time.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+
+            if batch.status != 'completed' or not batch.output_file_id:
+                logger.warning("Batch %s ended with status '%s'.", batch.id, batch.status)
+                return results
+
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                response = record.get('response') or {}
+                if response.get('status_code') != 200:
+                    continue
+                choices = response.get('body', {}).get('choices') or []
+                if choices and choices[0].get('message', {}).get('content'):
+                    results[int(record['custom_id'][1:])] = choices[0]['message']['content']
+            return results
+        except Exception as e:
+            self._report_error(e)
+            return results
+
+class DashScopeProvider:
+    """
+    Talks to Alibaba Cloud Bailian (DashScope) through the dashscope SDK.
+    """
+    def __init__(self):
+        # Retrieve API key and model name from environment variables
+        self.api_key = os.getenv('BAILIAN_API_KEY')
+        self.model_name = os.getenv('BAILIAN_MODEL_NAME', 'qwen-turbo') # Default to 'qwen-turbo' if not specified
+        self.cache_namespace = ('dashscope', self.model_name)
+
+        # Set the DashScope API key. The SDK is imported here, so the connector's helpers can be used without it
+        import dashscope
+        if self.api_key:
+            dashscope.api_key = self.api_key
+        else:
+            logger.warning("BAILIAN_API_KEY environment variable not found.")
+
+        # One keep-alive pool for all calls and threads, sized for concurrent batches. The SDK's own shared
+        # session keeps only 10 connections, so larger batches would keep opening (and TLS-handshaking) new ones.
+        self._session_params = {'session': self._http_session()} if self._sdk_accepts_session() else {}
+
+    @staticmethod
+    def _sdk_accepts_session() -> bool:
+        """Checks whether the installed dashscope SDK lets callers pass their own requests session (newer releases)."""
+        try:
+            from dashscope.api_entities.api_request_factory import _build_api_request
+        except ImportError:
+            return False
+        return 'session' in inspect.signature(_build_api_request).parameters
+
+    @staticmethod
+    def _http_session() -> 'requests.Session':
+        """Builds the requests session handed to the dashscope SDK, with a connection pool per host."""
+        import requests
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=_HTTP_MAX_KEEPALIVE_CONNECTIONS)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def generate_text(self, prompt: str, json_mode: bool = False, system_prompt: Optional[str] = None,
+                      max_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Sends one generation request.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+            json_mode (bool): Whether to ask the model to return a single JSON object (DashScope JSON mode).
+            system_prompt (Optional[str]): Instructions sent as a system message ahead of the prompt.
+            max_tokens (Optional[int]): The maximum length of the response. Defaults to the provider's limit.
+
+        Returns:
+            Optional[str]: The generated text content from the LLM, or None if an error occurs.
+        """
+        try:
+            # JSON mode makes the whole response one JSON object, so parsing needs no extraction step
+            extra_params = {'response_format': {'type': 'json_object'}} if json_mode else {}
+            if max_tokens:
+                extra_params['max_tokens'] = max_tokens
+            if system_prompt:
+                # Static instructions go first, so the server can reuse its cached prefix across calls
+                extra_params['messages'] = [
+                    {'role': 'system', 'content': system_prompt},
+                    {'role': 'user', 'content': prompt},
+                ]
+            else:
+                extra_params['prompt'] = prompt
+            from dashscope import Generation
+            response = Generation.call(
+                model=self.model_name,
+                result_format='message', # Request message format output
+                **extra_params,
+                **self._session_params
+            )
+
+            if response.status_code == 200:
+                # Extract content from the LLM response
+                return response.output.choices[0].message.content
+            else:
+                logger.error("LLM generation failed with status code %s: %s", response.status_code, response.message)
+                return None
+        except Exception as e:
+            logger.exception("Error during LLM text generation: %s", e)
+            return None
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Streams the response to a prompt. Closing the iterator early stops reading the response.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+
+        Yields:
+            str: Each non-empty piece of the response, in order.
+        """
+        try:
+            from dashscope import Generation
+            # incremental_output makes every chunk carry only the new text instead of the whole response so far
+            stream = Generation.call(
+                model=self.model_name,
+                prompt=prompt,
+                result_format='message',
+                stream=True,
+                incremental_output=True,
+                **self._session_params
+            )
+        except Exception as e:
+            logger.exception("Error during LLM text streaming: %s", e)
+            return
+        try:
+            for response in stream:
+                if response.status_code != 200:
+                    logger.error("LLM streaming failed with status code %s: %s", response.status_code, response.message)
+                    return
+                content = response.output.choices[0].message.content
+                if content:
+                    yield content
+        except Exception as e:
+            logger.exception("Error during LLM text streaming: %s", e)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+
+    def generate_many(self, prompts: List[str], system_prompts: List[Optional[str]], max_concurrency: int,
+                      json_mode: bool = False, max_tokens: Optional[int] = None) -> List[Optional[str]]:
+        """
+        Sends several generation requests concurrently.
+        Generation.call is blocking, so each request runs in the default thread pool while a semaphore
+        caps how many are in flight at once.
+
+        Args:
+            prompts (List[str]): The input prompts for the LLM.
+            system_prompts (List[Optional[str]]): A system message for each prompt (None for none), in prompt order.
+            max_concurrency (int): The maximum number of requests in flight at once.
+            json_mode (bool): Whether to request a single JSON object for every prompt.
+            max_tokens (Optional[int]): The maximum length of each response. Defaults to the provider's limit.
+
+        Returns:
+            List[Optional[str]]: The generated text for each prompt (None where generation failed), in prompt order.
+        """
+        async def generate_all() -> List[Optional[str]]:
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def generate(prompt: str, system_prompt: Optional[str]) -> Optional[str]:
+                async with semaphore:
+                    return await loop.run_in_executor(None, self.generate_text, prompt, json_mode, system_prompt, max_tokens)
+
+            return await asyncio.gather(*(
+                generate(prompt, system_prompt) for prompt, system_prompt in zip(prompts, system_prompts)
+            ))
+
+        return asyncio.run(generate_all())
+
+# Providers selectable through LLM_PROVIDER
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'dashscope': DashScopeProvider,
+}
+
+def create_provider(name: str) -> LLMProvider:
+    """
+    Creates the provider registered under a name.
+
+    Args:
+        name (str): One of the keys of PROVIDERS (case-insensitive).
+
+    Returns:
+        LLMProvider: The new provider.
+
+    Raises:
+        ValueError: If no provider is registered under the name.
+    """
+    provider_class = PROVIDERS.get(name.strip().lower())
+    if provider_class is None:
+        raise ValueError(f"Unknown LLM provider '{name}'. Expected one of: {', '.join(PROVIDERS)}")
+    return provider_class()
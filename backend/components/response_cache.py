@@ -0,0 +1,108 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import orjson
+
+class ResponseCache:
+    """
+    On-disk store of generated questions that were not used yet, keyed by (model, question type, document item).
+    Question generation oversamples, so a round usually ends with valid candidates left over; keeping them lets the
+    next run for the same item (e.g., a regeneration after a failure) use them instead of calling the LLM again.
+    Candidates are handed out once (`take` removes them), so a cached question is never served twice.
+    Each key is one JSON file; files older than the TTL are treated as empty.
+    """
+    def __init__(self, directory: str, namespace: str = '', max_candidates: int = 20,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        """
+        Args:
+            directory (str): The directory holding the cache files. Created if missing.
+            namespace (str): Mixed into every key, e.g. the model name, so other models' questions are not reused.
+            max_candidates (int): The maximum number of questions kept per key; further ones are dropped.
+            ttl_seconds (Optional[float]): How long (since the last write) a key's questions stay valid. None keeps them forever.
+        """
+        self.directory = directory
+        self.namespace = namespace
+        self.max_candidates = max_candidates
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, question_type: str, item: Dict) -> str:
+        """Returns the cache file for a question type and document item."""
+        key = orjson.dumps([self.namespace, question_type, item.get('title', ''), item.get('text', '')])
+        return os.path.join(self.directory, f"{hashlib.sha1(key).hexdigest()}.json")
+
+    def _read(self, path: str) -> List[Dict]:
+        """Reads a cache file, treating missing, expired or unreadable files as empty."""
+        try:
+            if self.ttl_seconds is not None and time.time() - os.stat(path).st_mtime > self.ttl_seconds:
+                os.remove(path)
+                return []
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return []
+
+    def _write(self, path: str, questions: List[Dict]):
+        """Writes a cache file atomically, or removes it when there is nothing left to keep."""
+        if not questions:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(orjson.dumps(questions))
+        os.replace(temp_path, path)
+
+    def take(self, question_type: str, item: Dict, count: int) -> List[Dict]:
+        """
+        Removes and returns up to `count` cached questions for an item.
+
+        Args:
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+            item (Dict): The document item the questions are about.
+            count (int): The maximum number of questions to return.
+
+        Returns:
+            List[Dict]: The cached questions, oldest first; empty on a miss.
+        """
+        path = self._path(question_type, item)
+        with self._lock:
+            questions = self._read(path)
+            if not questions:
+                return []
+            try:
+                self._write(path, questions[count:])
+            except OSError as e:
+                print(f"Error updating response cache {path}: {e}")
+                return []
+        return questions[:count]
+
+    def add(self, question_type: str, item: Dict, questions: List[Dict]):
+        """
+        Stores unused questions for an item, up to `max_candidates` per item.
+
+        Args:
+            question_type (str): One of 'single_choice', 'judge' or 'subjective'.
+            item (Dict): The document item the questions are about.
+            questions (List[Dict]): The questions to keep.
+        """
+        if not questions:
+            return
+        path = self._path(question_type, item)
+        with self._lock:
+            stored = self._read(path)
+            try:
+                self._write(path, (stored + questions)[:self.max_candidates])
+            except OSError as e:
+                print(f"Error writing response cache {path}: {e}")
+
+    def clear_cache(self):
+        """Removes every cached question."""
+        with self._lock:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.json'):
+                        os.remove(entry.path)
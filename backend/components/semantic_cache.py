@@ -0,0 +1,87 @@
+import os
+import importlib.util
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+# Optional dependency: without it the cache stays empty and every lookup misses. Only its presence is checked
+# here; the package (and torch behind it) is imported when the first text is embedded.
+_SENTENCE_TRANSFORMERS = importlib.util.find_spec('sentence_transformers') is not None
+
+# Multilingual model, so Chinese answers embed well; can be overridden via .env
+DEFAULT_EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+class SemanticCache:
+    """
+    Caches values by the meaning of a text rather than its exact spelling.
+    Entries live in namespaces (e.g., one per correct answer); a lookup only compares against
+    entries of the same namespace and hits when the cosine similarity reaches the threshold.
+    Embeddings are stored normalized, so all similarities of a namespace come from one matrix product.
+    """
+    def __init__(self, embed: Optional[Callable[[str], np.ndarray]] = None, threshold: float = 0.95):
+        """
+        Args:
+            embed (Optional[Callable[[str], np.ndarray]]): Turns a text into a vector. Defaults to a
+                sentence-transformers model, loaded on first use; if the package is missing, the cache is disabled.
+            threshold (float): The minimum cosine similarity (0-1) for a lookup to count as a hit.
+        """
+        self._embed = embed
+        self.threshold = threshold
+        self.enabled = embed is not None or _SENTENCE_TRANSFORMERS
+        self._matrices: Dict[Hashable, np.ndarray] = {}
+        self._values: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _embed_normalized(self, text: str) -> np.ndarray:
+        """Embeds the text and scales the vector to unit length."""
+        if self._embed is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(os.getenv('SEMANTIC_CACHE_MODEL', DEFAULT_EMBEDDING_MODEL))
+            self._embed = model.encode
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, namespace: Hashable, text: str) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """
+        Looks up the value stored for the most similar text in a namespace.
+
+        Args:
+            namespace (Hashable): The namespace to search.
+            text (str): The text to look up.
+
+        Returns:
+            Tuple[Optional[Any], Optional[np.ndarray]]: The cached value (None on a miss) and the text's embedding,
+                                                        which can be handed to `add` to avoid embedding it twice.
+        """
+        if not self.enabled:
+            return None, None
+        vector = self._embed_normalized(text)
+        with self._lock:
+            matrix = self._matrices.get(namespace)
+            if matrix is None:
+                return None, vector
+            similarities = matrix @ vector
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                return self._values[namespace][best], vector
+        return None, vector
+
+    def add(self, namespace: Hashable, text: str, value: Any, vector: Optional[np.ndarray] = None):
+        """
+        Stores a value for a text.
+
+        Args:
+            namespace (Hashable): The namespace to store it in.
+            text (str): The text the value belongs to.
+            value (Any): The value to cache.
+            vector (Optional[np.ndarray]): The text's embedding as returned by `get`, if already computed.
+        """
+        if not self.enabled:
+            return
+        if vector is None:
+            vector = self._embed_normalized(text)
+        with self._lock:
+            matrix = self._matrices.get(namespace)
+            self._matrices[namespace] = vector[np.newaxis, :] if matrix is None else np.vstack([matrix, vector])
+            self._values.setdefault(namespace, []).append(value)
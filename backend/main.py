@@ -1,6 +1,6 @@
 import os
 import sys
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 # Add project root to Python path to ensure imports work correctly
 # This assumes the script is run from the project root or a subdirectory
@@ -11,6 +11,7 @@ if project_root not in sys.path:
 # Import the refactored components and agents
 from backend.components.llm_connector import LLMConnector
 from backend.components.data_loader import DataLoader
+from backend.components.response_cache import ResponseCache
 from backend.agents.question_agent import QuestionAgent
 from backend.agents.quiz_agent import QuizAgent
 
@@ -19,13 +20,16 @@ class QuestionSystemBackend:
     Main backend class for the Question System.
     Orchestrates interactions between data loading, LLM, question generation, and quiz management.
     """
-    def __init__(self):
-        # Initialize components
-        self.data_loader = DataLoader()
+    def __init__(self, data_loader: Optional[DataLoader] = None):
+        # Initialize components; a caller that already has a DataLoader can share it (and its file cache)
+        self.data_loader = data_loader or DataLoader()
         self.llm_connector = LLMConnector()
 
         # Initialize agents with their required dependencies
-        self.question_agent = QuestionAgent(self.llm_connector, self.data_loader)
+        # Unused generated questions are kept next to the question banks, per model
+        response_cache = ResponseCache(os.path.join(self.data_loader.question_dataset_dir, '.cache'),
+                                       namespace=self.llm_connector.model_name)
+        self.question_agent = QuestionAgent(self.llm_connector, self.data_loader, response_cache=response_cache)
         # Pass llm_connector to QuizAgent for subjective answer checking
         self.quiz_agent = QuizAgent(self.llm_connector)
 
@@ -50,13 +54,15 @@ class QuestionSystemBackend:
         return self.data_loader.get_question_banks()
 
     # --- Question Generation Methods (Delegated to QuestionAgent) ---
-    def generate_questions(self, filename: str, count: int) -> List[Dict]:
+    def generate_questions(self, filename: str, count: int,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
         """Delegates to QuestionAgent to generate questions."""
-        return self.question_agent.generate_questions(filename, count)
+        return self.question_agent.generate_questions(filename, count, progress_callback)
 
-    def save_question_bank(self, source_filename: str, new_questions: List[Dict]) -> str:
+    def save_question_bank(self, source_filename: str, new_questions: List[Dict],
+                           existing_questions: Optional[List[Dict]] = None) -> str:
         """Delegates to QuestionAgent to save (and merge/deduplicate) a question bank."""
-        return self.question_agent.save_question_bank(source_filename, new_questions)
+        return self.question_agent.save_question_bank(source_filename, new_questions, existing_questions)
 
     # --- Quiz Management Methods (Delegated to DataLoader and QuizAgent) ---
     def load_questions_for_quiz(self, bank_name: str, count: int) -> List[Dict]:
@@ -67,3 +73,6 @@ class QuestionSystemBackend:
         """Delegates to QuizAgent to check an answer."""
         return self.quiz_agent.check_answer(question, user_answer)
 
+    def check_answers(self, qa_pairs: List[Tuple[Dict, str]]) -> List[bool]:
+        """Delegates to QuizAgent to check several answers at once."""
+        return self.quiz_agent.check_answers(qa_pairs)
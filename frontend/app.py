@@ -10,8 +10,12 @@ if project_root not in sys.path:
 import streamlit as st
 import json
 import time
-# Import the refactored QuestionSystemBackend from backend.main
-from backend.main import QuestionSystemBackend
+import orjson
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+# Only the file handling is imported up front; the LLM side (backend.main) is imported by the pages that use it
+from backend.components.data_loader import DataLoader
 
 # Page configuration for Streamlit app
 st.set_page_config(
@@ -21,12 +25,237 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize the backend using Streamlit's cache_resource to avoid re-initialization
+@st.cache_resource
+def get_data_loader():
+    return DataLoader()
+
+# Initialize the backend using Streamlit's cache_resource to avoid re-initialization.
+# The import is deferred to the first call, so the upload page never loads the LLM clients.
 @st.cache_resource
 def get_backend():
-    return QuestionSystemBackend()
+    from backend.main import QuestionSystemBackend
+    return QuestionSystemBackend(get_data_loader())
+
+# Upper bound on the document preview, so a few very long entries cannot blow up the page
+_PREVIEW_MAX_CHARS = 20000
+
+@dataclass
+class QuizState:
+    """Everything one quiz run keeps between reruns, stored in a single session slot ('quiz')."""
+    questions: List[Dict] = field(default_factory=list)
+    idx: int = 0 # Position of the current question
+    answers: List[Dict] = field(default_factory=list)
+    correct: int = 0 # Running count of correct answers
+    wrong: List[Dict] = field(default_factory=list) # The incorrect entries of `answers`, for the review
+    started: bool = False
+    completed: bool = False
+    pending_advance: bool = False # An answered question is showing its feedback
+    feedback_until: float = 0.0 # When the feedback pause is over (time.time())
+
+# Directory listings change only through this app, so reruns reuse them briefly; saves clear them right away
+@st.cache_data(ttl=5, show_spinner=False)
+def list_uploaded_files():
+    return get_data_loader().get_uploaded_files()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def list_question_banks():
+    return get_data_loader().get_question_banks()
+
+# Question generation runs on a background thread shared by all sessions, so it survives reruns
+# and the page stays responsive while the LLM works. The pool size caps how many generation jobs run at
+# once across all users; further jobs wait in its queue (set GENERATION_WORKERS=1 for a local model on one GPU).
+@st.cache_resource
+def get_generation_executor():
+    return ThreadPoolExecutor(max_workers=int(os.getenv('GENERATION_WORKERS', '2')),
+                              thread_name_prefix="question-generation")
+
+def generate_and_save(backend, selected_file: str, question_count: int, progress: dict):
+    """Generates questions and saves them to the question bank; runs on the generation executor."""
+    def report(done: int, total: int):
+        progress['done'] = done
+        progress['total'] = total
+
+    questions = backend.generate_questions(selected_file, question_count, progress_callback=report)
+    question_file = backend.save_question_bank(selected_file, questions) if questions else None
+    return questions, question_file
+
+@st.fragment(run_every=1)
+def show_generation_progress():
+    """Shows the progress of the running generation job, and reruns the page once it has finished."""
+    job = st.session_state.get('generation_job')
+    if job is None or job['future'].done():
+        st.rerun()
+    if not job['future'].running():
+        st.info("⏳ 排队中，其他出题任务完成后自动开始…")
+        return
+    progress = job['progress']
+    st.progress(progress['done'] / progress['total'], text=f"正在生成题目... ({progress['done']}/{progress['total']})")
+
+@st.fragment(run_every=0.25)
+def advance_after_feedback():
+    """Moves to the next question once the answer feedback has been shown long enough.
+    The fragment's timed reruns carry the wait, so no script thread sleeps through it."""
+    quiz = st.session_state.quiz
+    if time.time() >= quiz.feedback_until:
+        st.session_state.pop(f"q_{quiz.idx}", None) # The answered question's input is not shown again
+        quiz.idx += 1
+        quiz.pending_advance = False
+        st.rerun()
+
+@st.fragment
+def render_question():
+    """
+    Renders the current quiz question with its answer input and buttons.
+    Answering reruns only this fragment; the whole page reruns when the quiz ends or moves to the next question.
+    """
+    quiz = st.session_state.quiz
+    questions = quiz.questions
+    current_idx = quiz.idx
+
+    # An answered question stays on screen with its feedback until the short pause is over
+    if quiz.pending_advance:
+        advance_after_feedback()
+
+    if current_idx < len(questions):
+        question = questions[current_idx]
+
+        st.subheader(f"问题 {current_idx + 1}/{len(questions)}")
+        st.markdown(f"**{question['question']}**")
+
+        # Use a unique key for input widgets to ensure content resets on rerun
+        user_answer_key = f"q_{current_idx}"
 
-backend = get_backend()
+        if question['type'] == 'single_choice':
+            options = question['options']
+            user_input = st.radio(
+                "请选择答案:",
+                options,
+                key=user_answer_key
+            )
+        elif question['type'] == 'judge':
+            user_input = st.text_input(
+                "请输入答案 (如: 正确/错误、是/否等):",
+                key=user_answer_key
+            )
+        elif question['type'] == 'subjective': # New input for subjective questions
+            user_input = st.text_area(
+                "请输入你的答案:",
+                height=150,
+                key=user_answer_key
+            )
+        else:
+            user_input = None # Fallback
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("提交答案", key=f"submit_btn_{current_idx}",
+                         disabled=quiz.pending_advance):
+                user_answer = user_input
+                if user_answer is not None and user_answer.strip() != "": # Ensure answer is not empty for subjective
+                    # Check answer using the backend method
+                    is_correct = get_backend().check_answer(question, user_answer)
+                    # The correct option's full text, looked up once by its letter for the wrong-answer review
+                    correct_answer_display = question['answer']
+                    if question['type'] == 'single_choice' and 'options' in question:
+                        options_by_letter = {opt.split('.', 1)[0].strip().lower(): opt for opt in question['options']}
+                        correct_answer_display = options_by_letter.get(str(question['answer']).strip().lower(),
+                                                                       correct_answer_display)
+                    answer = {
+                        'question': question,
+                        'user_answer': user_answer,
+                        'is_correct': is_correct,
+                        'correct_answer_display': correct_answer_display
+                    }
+                    quiz.answers.append(answer)
+                    if is_correct:
+                        quiz.correct += 1
+                    else:
+                        quiz.wrong.append(answer)
+
+                    # Display feedback
+                    if is_correct:
+                        st.success("✅ 回答正确！")
+                    else:
+                        st.error(f"❌ 回答错误，正确答案是: {question['answer']}")
+
+                    # Move to next question or complete quiz
+                    if current_idx < len(questions) - 1:
+                        # Small delay for user to see feedback, counted down by the fragment's reruns
+                        quiz.feedback_until = time.time() + 1.0
+                        quiz.pending_advance = True
+                        advance_after_feedback()
+                    else:
+                        # Quiz completed
+                        quiz.completed = True
+                        quiz.started = False # Stop displaying questions
+                        st.rerun() # Rerun to display results
+                else:
+                    st.warning("请先选择或输入答案")
+
+        with col2:
+            if st.button("结束答题", key=f"end_quiz_btn_{current_idx}"):
+                quiz.completed = True
+                quiz.started = False # Stop displaying questions
+                st.rerun()
+    else: # If current_idx == len(questions), all questions answered
+        quiz.completed = True
+        quiz.started = False # Stop displaying questions
+        st.rerun() # Force rerun to display results
+
+def process_upload(uploaded_file) -> dict:
+    """Validates and saves an uploaded document; returns what the upload page shows for it."""
+    upload = {'file_id': uploaded_file.file_id}
+    try:
+        # Parse the uploaded bytes directly; orjson skips the separate UTF-8 decode step of json.load
+        file_content = orjson.loads(uploaded_file.getvalue())
+
+        # Validate file format using the data loader
+        if not get_data_loader().validate_json_format(file_content):
+            upload['error'] = "❌ 文件格式不符合要求，请检查JSON格式"
+            return upload
+
+        # Save the file using the data loader
+        upload['file_path'] = get_data_loader().save_uploaded_file(uploaded_file)
+        list_uploaded_files.clear()
+
+        # First 3 entries, sent as one bounded string rather than an object tree
+        preview = orjson.dumps(file_content[:3], option=orjson.OPT_INDENT_2).decode()
+        if len(preview) > _PREVIEW_MAX_CHARS:
+            preview = preview[:_PREVIEW_MAX_CHARS] + "\n..."
+        upload['preview'] = preview
+        upload['entry_count'] = len(file_content)
+    except json.JSONDecodeError: # orjson.JSONDecodeError is a subclass
+        upload['error'] = "❌ 文件格式错误，请上传有效的JSON文件"
+    except Exception as e:
+        upload['error'] = f"❌ 处理文件时出错: {str(e)}"
+    return upload
+
+def show_generation_result(future: Future):
+    """Shows the outcome of a finished generation job."""
+    try:
+        questions, question_file = future.result()
+    except Exception as e:
+        st.error(f"❌ 生成过程中出错: {str(e)}")
+        return
+
+    if questions:
+        list_question_banks.clear() # The bank may be new
+        st.success(f"🎉 成功生成 {len(questions)} 道题目！")
+        st.info(f"📝 题库已保存为: {question_file}")
+
+        # Display question preview
+        st.subheader("📋 题目预览")
+        with st.expander("查看生成的题目"):
+            for i, q in enumerate(questions[:min(len(questions), 3)], 1): # Show max 3 questions
+                st.markdown(f"**题目 {i}**")
+                st.markdown(f"类型: {q['type']}")
+                st.markdown(f"问题: {q['question']}")
+                if q['type'] == 'single_choice':
+                    st.markdown(f"选项: {q['options']}")
+                st.markdown(f"答案: {q['answer']}")
+                st.markdown("---")
+    else:
+        st.error("❌ 题目生成失败，请检查文档内容")
 
 # Main title of the application
 st.title("📚 本地知识库自动出题系统")
@@ -46,13 +275,9 @@ new_page_selection = st.sidebar.radio(
 
 # Detect if the page has switched
 if new_page_selection != st.session_state.current_page_selection:
-    # If page switched, reset all quiz-related session states
-    for key in ['quiz_questions', 'current_question', 'user_answers', 'quiz_started', 'quiz_completed']:
-        if key in st.session_state:
-            del st.session_state[key]
+    # If page switched, reset the quiz state. This run already renders the new page, so no extra rerun is needed.
+    st.session_state.pop('quiz', None)
     st.session_state.current_page_selection = new_page_selection
-    # Rerun immediately to ensure state is cleared for the new page
-    st.rerun()
 
 # Update the current page variable
 page = new_page_selection
@@ -68,36 +293,30 @@ if page == "📁 选择上传技术文档":
     )
 
     if uploaded_file is not None:
-        try:
-            # Read file content
-            file_content = json.load(uploaded_file)
-
-            # Validate file format using the backend method
-            if backend.validate_json_format(file_content):
-                # Save the file using the backend method
-                file_path = backend.save_uploaded_file(uploaded_file)
-                st.success(f"✅ 文件上传成功！已保存为: {file_path}")
-
-                # Display file preview
-                st.subheader("📄 文件内容预览")
-                with st.expander("查看文件内容"):
-                    st.json(file_content[:3])  # Display first 3 entries
-                    if len(file_content) > 3:
-                        st.info(f"文件共包含 {len(file_content)} 个条目")
-            else:
-                st.error("❌ 文件格式不符合要求，请检查JSON格式")
-
-        except json.JSONDecodeError:
-            st.error("❌ 文件格式错误，请上传有效的JSON文件")
-        except Exception as e:
-            st.error(f"❌ 处理文件时出错: {str(e)}")
+        # The uploader keeps its file across reruns; parse, validate and save each upload only once
+        upload = st.session_state.get('processed_upload')
+        if upload is None or upload['file_id'] != uploaded_file.file_id:
+            upload = process_upload(uploaded_file)
+            st.session_state.processed_upload = upload
+
+        if 'error' in upload:
+            st.error(upload['error'])
+        else:
+            st.success(f"✅ 文件上传成功！已保存为: {upload['file_path']}")
+
+            # Display file preview
+            st.subheader("📄 文件内容预览")
+            with st.expander("查看文件内容"):
+                st.code(upload['preview'], language='json')
+                if upload['entry_count'] > 3:
+                    st.info(f"文件共包含 {upload['entry_count']} 个条目")
 
 # Page 2: Start Question Generation
 elif page == "🎯 开始出题":
     st.header("🎯 智能题目生成")
 
-    # Get list of uploaded files using the backend method
-    uploaded_files = backend.get_uploaded_files()
+    # Get list of uploaded files (cached listing)
+    uploaded_files = list_uploaded_files()
 
     if not uploaded_files:
         st.warning("⚠️ 暂无已上传的技术文档，请先上传文档")
@@ -105,75 +324,50 @@ elif page == "🎯 开始出题":
             st.session_state.current_page_selection = "📁 选择上传技术文档"
             st.rerun()
     else:
-        col1, col2 = st.columns(2)
+        generating = 'generation_job' in st.session_state
+        # The choices are sent together with the button press, so changing them does not rerun the page
+        with st.form("generation_settings"):
+            col1, col2 = st.columns(2)
 
-        with col1:
-            selected_file = st.selectbox(
-                "选择技术文档",
-                uploaded_files,
-                help="选择要生成题目的技术规范文档"
-            )
+            with col1:
+                selected_file = st.selectbox(
+                    "选择技术文档",
+                    uploaded_files,
+                    help="选择要生成题目的技术规范文档"
+                )
 
-        with col2:
-            question_count = st.selectbox(
-                "选择出题数量",
-                [5, 10, 20],
-                help="选择要生成的题目数量"
-            )
+            with col2:
+                question_count = st.selectbox(
+                    "选择出题数量",
+                    [5, 10, 20],
+                    help="选择要生成的题目数量"
+                )
 
-        if st.button("🚀 开始生成题目", type="primary"):
+            submitted = st.form_submit_button("🚀 开始生成题目", type="primary", disabled=generating)
+        if submitted:
             if selected_file and question_count:
-                # Display generation progress
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-
-                try:
-                    status_text.text("正在分析文档内容...")
-                    progress_bar.progress(25)
-
-                    # Generate questions using the backend method
-                    questions = backend.generate_questions(selected_file, question_count)
-
-                    status_text.text("正在生成题目...")
-                    progress_bar.progress(75)
-
-                    if questions:
-                        # Save question bank using the backend method
-                        question_file = backend.save_question_bank(selected_file, questions)
-                        progress_bar.progress(100)
-
-                        status_text.text("✅ 题目生成完成！")
-                        st.success(f"🎉 成功生成 {len(questions)} 道题目！")
-                        st.info(f"📝 题库已保存为: {question_file}")
-
-                        # Display question preview
-                        st.subheader("📋 题目预览")
-                        with st.expander("查看生成的题目"):
-                            for i, q in enumerate(questions[:min(len(questions), 3)], 1): # Show max 3 questions
-                                st.markdown(f"**题目 {i}**")
-                                st.markdown(f"类型: {q['type']}")
-                                st.markdown(f"问题: {q['question']}")
-                                if q['type'] == 'single_choice':
-                                    st.markdown(f"选项: {q['options']}")
-                                st.markdown(f"答案: {q['answer']}")
-                                st.markdown("---")
-                    else:
-                        st.error("❌ 题目生成失败，请检查文档内容")
-
-                except Exception as e:
-                    st.error(f"❌ 生成过程中出错: {str(e)}")
-
-                finally:
-                    # Clear progress bar and status text
-                    progress_bar.empty()
-                    status_text.empty()
+                # Hand the work to the executor; this run returns right away and the job is polled below
+                progress = {'done': 0, 'total': question_count}
+                # Resolve the cached backend here: Streamlit APIs need the script thread's context, not the worker's
+                backend = get_backend()
+                future = get_generation_executor().submit(generate_and_save, backend, selected_file, question_count, progress)
+                st.session_state.generation_job = {'future': future, 'progress': progress}
+                st.rerun() # Redraw the form with its button disabled while the job runs
+
+        job = st.session_state.get('generation_job')
+        if job is not None:
+            if job['future'].done():
+                del st.session_state.generation_job
+                show_generation_result(job['future'])
+            else:
+                show_generation_progress()
 
 # Page 3: Start Quiz
 elif page == "✏️ 立即答题":
     st.header("✏️ 开始答题")
 
-    # Get available question banks using the backend method
-    question_banks = backend.get_question_banks()
+    # Get available question banks (cached listing)
+    question_banks = list_question_banks()
 
     if not question_banks:
         st.warning("⚠️ 暂无可用题库，请先生成题目")
@@ -181,126 +375,51 @@ elif page == "✏️ 立即答题":
             st.session_state.current_page_selection = "🎯 开始出题"
             st.rerun()
     else:
+        quiz = st.session_state.get('quiz') or QuizState()
+
         # If quiz not started and not completed, show selection interface
-        if not st.session_state.get('quiz_started', False) and not st.session_state.get('quiz_completed', False):
-            col1, col2 = st.columns(2)
+        if not quiz.started and not quiz.completed:
+            # The choices are sent together with the button press, so changing them does not rerun the page
+            with st.form("quiz_settings"):
+                col1, col2 = st.columns(2)
 
-            with col1:
-                selected_bank = st.selectbox(
-                    "选择题库",
-                    question_banks,
-                    help="选择要答题的题库",
-                    key="select_quiz_bank"
-                )
+                with col1:
+                    selected_bank = st.selectbox(
+                        "选择题库",
+                        question_banks,
+                        help="选择要答题的题库",
+                        key="select_quiz_bank"
+                    )
 
-            with col2:
-                answer_count = st.selectbox(
-                    "选择答题数量",
-                    [5, 10, 20],
-                    help="选择要答题的数量",
-                    key="select_quiz_count"
-                )
+                with col2:
+                    answer_count = st.selectbox(
+                        "选择答题数量",
+                        [5, 10, 20],
+                        help="选择要答题的数量",
+                        key="select_quiz_count"
+                    )
 
-            if st.button("📝 开始答题", type="primary", key="start_quiz_button"):
+                submitted = st.form_submit_button("📝 开始答题", type="primary")
+            if submitted:
                 # Initialize quiz state
-                questions = backend.load_questions_for_quiz(selected_bank, answer_count)
+                questions = get_backend().load_questions_for_quiz(selected_bank, answer_count)
                 if questions:
-                    st.session_state.quiz_questions = questions
-                    st.session_state.current_question = 0
-                    st.session_state.user_answers = []
-                    st.session_state.quiz_started = True
-                    st.session_state.quiz_completed = False # Ensure set to incomplete when starting
+                    st.session_state.quiz = QuizState(questions=questions, started=True)
                     st.rerun() # Rerun to enter quiz flow
                 else:
                     st.error("无法加载题目，请检查题库或选择数量。")
 
         # Quiz interface
-        if st.session_state.get('quiz_started', False) and not st.session_state.get('quiz_completed', False):
-            questions = st.session_state.quiz_questions
-            current_idx = st.session_state.current_question
-
-            if current_idx < len(questions):
-                question = questions[current_idx]
-
-                st.subheader(f"问题 {current_idx + 1}/{len(questions)}")
-                st.markdown(f"**{question['question']}**")
-
-                # Use a unique key for input widgets to ensure content resets on rerun
-                user_answer_key = f"q_{current_idx}_{st.session_state.get('rerun_count', 0)}"
-
-                if question['type'] == 'single_choice':
-                    options = question['options']
-                    user_input = st.radio(
-                        "请选择答案:",
-                        options,
-                        key=user_answer_key
-                    )
-                elif question['type'] == 'judge':
-                    user_input = st.text_input(
-                        "请输入答案 (如: 正确/错误、是/否等):",
-                        key=user_answer_key
-                    )
-                elif question['type'] == 'subjective': # New input for subjective questions
-                    user_input = st.text_area(
-                        "请输入你的答案:",
-                        height=150,
-                        key=user_answer_key
-                    )
-                else:
-                    user_input = None # Fallback
-
-                # Save user input to session state to access after button click
-                st.session_state.current_user_input = user_input
-
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("提交答案", key=f"submit_btn_{current_idx}"):
-                        user_answer = st.session_state.current_user_input
-                        if user_answer is not None and user_answer.strip() != "": # Ensure answer is not empty for subjective
-                            # Check answer using the backend method
-                            is_correct = backend.check_answer(question, user_answer)
-                            st.session_state.user_answers.append({
-                                'question': question,
-                                'user_answer': user_answer,
-                                'is_correct': is_correct
-                            })
-
-                            # Display feedback
-                            if is_correct:
-                                st.success("✅ 回答正确！")
-                            else:
-                                st.error(f"❌ 回答错误，正确答案是: {question['answer']}")
-
-                            # Move to next question or complete quiz
-                            if current_idx < len(questions) - 1:
-                                time.sleep(1) # Small delay for user to see feedback
-                                st.session_state.current_question += 1
-                                st.rerun()
-                            else:
-                                # Quiz completed
-                                st.session_state.quiz_completed = True
-                                st.session_state.quiz_started = False # Stop displaying questions
-                                st.rerun() # Rerun to display results
-                        else:
-                            st.warning("请先选择或输入答案")
-
-                with col2:
-                    if st.button("结束答题", key=f"end_quiz_btn_{current_idx}"):
-                        st.session_state.quiz_completed = True
-                        st.session_state.quiz_started = False # Stop displaying questions
-                        st.rerun()
-            else: # If current_idx == len(questions), all questions answered
-                st.session_state.quiz_completed = True
-                st.session_state.quiz_started = False # Stop displaying questions
-                st.rerun() # Force rerun to display results
+        if quiz.started and not quiz.completed:
+            render_question()
 
         # Display quiz results (if quiz_completed is True and on the quiz page)
-        if st.session_state.get('quiz_completed', False):
+        if quiz.completed:
             st.success("🎉 答题完成！")
 
             # Calculate results
-            total_questions = len(st.session_state.user_answers)
-            correct_count = sum(1 for ans in st.session_state.user_answers if ans['is_correct'])
+            total_questions = len(quiz.answers)
+            correct_count = quiz.correct
             accuracy = (correct_count / total_questions) * 100 if total_questions > 0 else 0
 
             # Display scores
@@ -323,7 +442,7 @@ elif page == "✏️ 立即答题":
                 st.success("🎊 掌握情况良好，继续保持！")
 
             # Wrong answer analysis
-            wrong_answers = [ans for ans in st.session_state.user_answers if not ans['is_correct']]
+            wrong_answers = quiz.wrong
             if wrong_answers:
                 st.subheader("❌ 错题分析")
                 with st.expander("查看错题详情"):
@@ -331,31 +450,15 @@ elif page == "✏️ 立即答题":
                         st.markdown(f"**错题 {i}**")
                         st.markdown(f"问题: {ans['question']['question']}")
                         st.markdown(f"你的答案: {ans['user_answer']}")
-                        correct_answer_display = ans['question']['answer']
-                        if ans['question']['type'] == 'single_choice' and 'options' in ans['question']:
-                            # Find the full option text for single choice questions
-                            for option in ans['question']['options']:
-                                if option.lower().startswith(correct_answer_display.lower() + "."):
-                                    correct_answer_display = option
-                                    break
-                        st.markdown(f"正确答案: {correct_answer_display}")
+                        st.markdown(f"正确答案: {ans['correct_answer_display']}")
                         st.markdown("---")
 
             # Retake quiz button
             if st.button("🔄 重新答题"):
-                # Clear all quiz-related session states for a new quiz round
-                for key in ['quiz_questions', 'current_question', 'user_answers', 'quiz_started', 'quiz_completed', 'current_user_input']:
-                    if key in st.session_state:
-                        del st.session_state[key]
+                # Clear the quiz state for a new quiz round
+                st.session_state.pop('quiz', None)
                 st.rerun()
 
 # Footer information
 st.markdown("---")
-st.markdown(
-    """
-    <div style='text-align: center; color: #666;'>
-        <p>📚 本地知识库自动出题系统 | 基于大语言模型智能生成题目</p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+st.caption("📚 本地知识库自动出题系统 | 基于大语言模型智能生成题目")
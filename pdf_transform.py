@@ -4,44 +4,157 @@
 import os
 import json
 import re
-from typing import List, Dict, Optional
+import time
+import sqlite3
+import hashlib
+import inspect
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional
 import fitz  # PyMuPDF
+import requests
 from dotenv import load_dotenv
 import dashscope
 from dashscope import Generation
 
+# 章节编号相关的正则，预先编译
+_SECTION_NUM = re.compile(r'\d+\.\d+(?:\.\d+)*')  # 类似 4.3.1 的编号
+_SECTION_SPLIT = re.compile(r'(\d+\.\d+(?:\.\d+)*)\s+')  # 按编号切分，保留编号
+_SECTION_HEADER = re.compile(r'(\d+\.\d+(?:\.\d+)*)\s+([^\n]+)')  # 编号 + 同一行的标题
+_HAS_SECTION_NUM = re.compile(r'\d+\.\d+')
+
+# 大模型调用参数，同时也是缓存键的一部分
+LLM_MODEL = 'qwen-max'
+LLM_TEMPERATURE = 0.1  # 进一步降低温度以获得更稳定的输出
+LLM_TOP_P = 0.8
+
+def _find_json_spans(text: str):
+    """线性扫描文本（跳过字符串内的括号），依次返回完整的顶层JSON数组，以及不在其他对象内部的JSON对象"""
+    stack = []  # 未闭合的开括号及其位置
+    object_depth = 0  # stack 中 '{' 的个数
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # 括号外的引号只是普通文字
+            in_string = bool(stack)
+        elif ch == '[' or ch == '{':
+            stack.append((ch, i))
+            object_depth += ch == '{'
+        elif (ch == ']' or ch == '}') and stack:
+            opener, start = stack.pop()
+            if (opener == '{') != (ch == '}'):
+                # 括号不匹配，丢弃之前的状态重新开始
+                stack.clear()
+                object_depth = 0
+                continue
+            if opener == '{':
+                object_depth -= 1
+            if not stack or (opener == '{' and object_depth == 0):
+                yield text[start:i + 1]
+
 class PDFToJSONConverter:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 8, cache_path: Optional[str] = '.pdf_llm_cache.sqlite',
+                 cache_ttl_seconds: float = 7 * 24 * 3600):
         load_dotenv()
         self.api_key = os.getenv('BAILIAN_API_KEY')
         dashscope.api_key = self.api_key
+        # 同时进行的大模型请求数上限，避免超出接口限流
+        self.max_concurrency = max_concurrency
+        # 同一转换器被多个线程同时调用 convert_pdf_to_json 时，正在进行的请求总数仍不超过 max_concurrency
+        self._llm_slots = threading.BoundedSemaphore(max_concurrency)
+        # 所有块的请求共用一个连接池，复用 TCP/TLS 连接（需要 dashscope SDK 支持传入 session）
+        self._session_params = {'session': self._http_session()} if self._sdk_accepts_session() else {}
+        
+        # 大模型响应的本地缓存（SQLite），重复处理同一文档时不再重复调用接口；cache_path 为 None 时不缓存
+        self.cache_path = cache_path
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+        self._cache_db = None
+        if cache_path:
+            # 批量转换时多个进程共用同一个缓存文件，写入冲突时等待而不是立即报错
+            self._cache_db = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, response TEXT, created REAL)"
+            )
+            self._cache_db.commit()
+    
+    @staticmethod
+    def _sdk_accepts_session() -> bool:
+        """检查已安装的 dashscope SDK 是否支持传入自定义的 requests session"""
+        try:
+            from dashscope.api_entities.api_request_factory import _build_api_request
+        except ImportError:
+            return False
+        return 'session' in inspect.signature(_build_api_request).parameters
+    
+    def _http_session(self) -> requests.Session:
+        """创建连接池大小与并发数一致的 requests session"""
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        return session
+    
+    def _cache_get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存响应，未命中时返回 None"""
+        if self._cache_db is None:
+            return None
+        with self._cache_lock:
+            row = self._cache_db.execute(
+                "SELECT response FROM cache WHERE key = ? AND created >= ?",
+                (key, time.time() - self.cache_ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.cache_misses += 1
+                return None
+            self.cache_hits += 1
+            return row[0]
+    
+    def _cache_put(self, key: str, response: str):
+        """写入（或覆盖）一条缓存响应"""
+        if self._cache_db is None:
+            return
+        with self._cache_lock:
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO cache (key, response, created) VALUES (?, ?, ?)",
+                (key, response, time.time())
+            )
+            self._cache_db.commit()
         
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """从PDF中提取文本内容"""
         try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text += page.get_text()
-            doc.close()
-            return text
+            with fitz.open(pdf_path) as doc:
+                return ''.join(page.get_text() for page in doc)
         except Exception as e:
             print(f"PDF文本提取失败: {e}")
             return ""
     
     def call_llm(self, prompt: str, max_tokens: int = 3000) -> str:
-        """调用阿里百炼大模型API"""
+        """调用阿里百炼大模型API，成功的响应会缓存，相同的请求直接返回缓存结果"""
+        params = {'model': LLM_MODEL, 'max_tokens': max_tokens, 'temperature': LLM_TEMPERATURE, 'top_p': LLM_TOP_P}
+        cache_key = hashlib.sha256(
+            json.dumps({**params, 'prompt': prompt}, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = Generation.call(
-                model='qwen-max',
-                prompt=prompt,
-                max_tokens=max_tokens,
-                temperature=0.1,  # 进一步降低温度以获得更稳定的输出
-                top_p=0.8
-            )
+            with self._llm_slots:
+                response = Generation.call(prompt=prompt, **params, **self._session_params)
             
             if response.status_code == 200:
+                self._cache_put(cache_key, response.output.text)
                 return response.output.text
             else:
                 return f"API调用失败: {response.message}"
@@ -51,46 +164,29 @@ class PDFToJSONConverter:
     def split_text_into_chunks(self, text: str, max_chunk_size: int = 2000) -> List[str]:
         """将长文本分割成较小的块"""
         # 首先尝试按章节编号分割
-        # 匹配类似 4.3.1、4.3.2 这样的编号
-        section_pattern = r'(\d+\.\d+(?:\.\d+)*)\s+'
-        sections = re.split(section_pattern, text)
+        # 匹配类似 4.3.1、4.3.2 这样的编号；编号前的文字单独成段，之后每段为“编号 + 到下一个编号为止的内容”
+        matches = list(_SECTION_SPLIT.finditer(text))
+        boundaries = [match.start() for match in matches[1:]] + [len(text)]
+        pieces = [text[:matches[0].start() if matches else len(text)]]
+        pieces.extend(match.group(1) + " " + text[match.end():end] for match, end in zip(matches, boundaries))
         
         chunks = []
-        current_chunk = ""
+        # 用列表收集片段，分块时再统一拼接，避免长文本反复拼接字符串
+        current_parts = []
         current_size = 0
         
-        i = 0
-        while i < len(sections):
-            section = sections[i]
-            
-            # 如果这是一个章节编号
-            if re.match(r'^\d+\.\d+(?:\.\d+)*$', section.strip()):
-                # 获取对应的内容
-                content = sections[i + 1] if i + 1 < len(sections) else ""
-                full_section = section + " " + content
-                
-                if current_size + len(full_section) > max_chunk_size and current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = full_section
-                    current_size = len(full_section)
-                else:
-                    current_chunk += full_section
-                    current_size += len(full_section)
-                
-                i += 2  # 跳过内容部分
+        for piece in pieces:
+            if current_size + len(piece) > max_chunk_size and current_size:
+                chunks.append(''.join(current_parts).strip())
+                current_parts = [piece]
+                current_size = len(piece)
             else:
-                # 普通内容，添加到当前块
-                if current_size + len(section) > max_chunk_size and current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = section
-                    current_size = len(section)
-                else:
-                    current_chunk += section
-                    current_size += len(section)
-                i += 1
-        
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+                current_parts.append(piece)
+                current_size += len(piece)
+        
+        last_chunk = ''.join(current_parts).strip()
+        if last_chunk:
+            chunks.append(last_chunk)
         
         # 如果没有找到章节，使用原来的分割方法
         if len(chunks) <= 1:
@@ -102,18 +198,21 @@ class PDFToJSONConverter:
         """按段落分割文本"""
         paragraphs = text.split('\n\n')
         chunks = []
-        current_chunk = ""
+        current_parts = []
+        current_size = 0
         
         for paragraph in paragraphs:
-            if len(current_chunk + paragraph) < max_chunk_size:
-                current_chunk += paragraph + "\n\n"
+            if current_size + len(paragraph) < max_chunk_size:
+                current_parts.append(paragraph + "\n\n")
+                current_size += len(paragraph) + 2
             else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = paragraph + "\n\n"
+                if current_size:
+                    chunks.append(''.join(current_parts).strip())
+                current_parts = [paragraph + "\n\n"]
+                current_size = len(paragraph) + 2
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if current_size:
+            chunks.append(''.join(current_parts).strip())
         
         return chunks
     
@@ -178,42 +277,37 @@ class PDFToJSONConverter:
             except:
                 pass
         
-        # 方法2：寻找JSON对象数组（可能有多个独立的对象）
-        json_objects = re.findall(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response)
-        if json_objects:
+        # 方法2：逐个扫描完整的JSON片段，优先返回对象数组，否则收集独立的对象（响应被截断时也能保留已完整的部分）
+        parsed_objects = []
+        for span in _find_json_spans(response):
             try:
-                parsed_objects = []
-                for obj_str in json_objects:
-                    obj = json.loads(obj_str)
-                    parsed_objects.append(obj)
-                return parsed_objects
-            except:
-                pass
+                data = json.loads(span)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                parsed_objects.append(data)
+            elif data and all(isinstance(item, dict) for item in data):
+                return data
         
-        # 方法3：清理响应中的多余字符
-        try:
-            cleaned_response = re.sub(r'```json\s*|\s*```', '', response)
-            cleaned_response = re.sub(r'^[^\[]*\[', '[', cleaned_response)
-            cleaned_response = re.sub(r'\][^\]]*$', ']', cleaned_response)
-            return json.loads(cleaned_response)
-        except:
-            pass
-        
-        return []
+        return parsed_objects
     
     def extract_sections_by_regex(self, text: str) -> List[Dict]:
         """使用正则表达式作为备用方法提取章节"""
         print("使用正则表达式提取章节...")
         
-        # 匹配章节编号模式
-        section_pattern = r'(\d+\.\d+(?:\.\d+)*)\s+([^\n]+?)(?=\n|$)(.*?)(?=\d+\.\d+(?:\.\d+)*\s+|$)'
-        matches = re.findall(section_pattern, text, re.DOTALL)
-        
+        # 先找章节标题（编号 + 标题行），正文取到下一个“编号 + 空白”之前，避免惰性匹配反复回溯
         sections = []
-        for match in matches:
-            idx = match[0].strip()
-            title = match[1].strip()
-            content = match[2].strip()
+        pos = 0
+        while True:
+            header = _SECTION_HEADER.search(text, pos)
+            if header is None:
+                break
+            boundary = _SECTION_SPLIT.search(text, header.end())
+            pos = boundary.start() if boundary else len(text)
+            
+            idx = header.group(1)  # 编号只含数字和点，无需 strip
+            title = header.group(2).strip()
+            content = text[header.end():pos].strip()
             
             if idx and (title or content):
                 sections.append({
@@ -227,7 +321,7 @@ class PDFToJSONConverter:
             # 按段落分割，寻找包含编号的段落
             paragraphs = text.split('\n\n')
             for i, paragraph in enumerate(paragraphs):
-                if re.search(r'\d+\.\d+', paragraph):
+                if _HAS_SECTION_NUM.search(paragraph):
                     sections.append({
                         "idx": f"section_{i+1}",
                         "title": "提取的章节",
@@ -238,35 +332,25 @@ class PDFToJSONConverter:
     
     def merge_and_clean_sections(self, all_sections: List[Dict]) -> List[Dict]:
         """合并和清理章节数据"""
-        # 去重和合并逻辑
-        seen_idx = set()
-        cleaned_sections = []
+        # 去重和合并逻辑：按编号保留第一次出现的章节，dict 保持插入顺序
+        cleaned_sections = {}
         
         for section in all_sections:
-            idx = section.get('idx', '')
-            title = section.get('title', '')
-            text = section.get('text', '')
+            idx = section.get('idx', '').strip()
+            text = section.get('text', '').strip()
             
-            # 基本验证
-            if not idx or not text:
+            # 基本验证和去重
+            if not idx or not text or idx in cleaned_sections:
                 continue
             
-            # 去重
-            if idx in seen_idx:
-                continue
-            
-            seen_idx.add(idx)
-            
             # 清理内容
-            cleaned_section = {
-                "idx": idx.strip(),
-                "title": title.strip(),
-                "text": text.strip()
+            cleaned_sections[idx] = {
+                "idx": idx,
+                "title": section.get('title', '').strip(),
+                "text": text
             }
-            
-            cleaned_sections.append(cleaned_section)
         
-        return cleaned_sections
+        return list(cleaned_sections.values())
     
     def convert_pdf_to_json(self, pdf_path: str, output_path: str) -> bool:
         """将PDF转换为JSON格式"""
@@ -284,40 +368,79 @@ class PDFToJSONConverter:
         chunks = self.split_text_into_chunks(text)
         print(f"文本分割为 {len(chunks)} 个块")
         
-        # 处理每个文本块
+        # 各文本块的大模型请求相互独立，并发发送；内容相同的块（如重复的附录条文）只请求一次，结果按块的顺序汇总
+        # 不含任何章节编号的块（封面、目录等）提取不出章节，直接跳过，不消耗大模型调用
+        unique_chunks = [chunk for chunk in dict.fromkeys(chunks) if _HAS_SECTION_NUM.search(chunk)]
+        print(f"并发处理 {len(unique_chunks)} 个不重复且含章节编号的文本块（最多 {self.max_concurrency} 个同时进行）...")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            sections_by_chunk = dict(zip(unique_chunks, executor.map(self.extract_structured_content, unique_chunks)))
+        chunk_sections = [sections_by_chunk.get(chunk, []) for chunk in chunks]
+        
         all_sections = []
-        for i, chunk in enumerate(chunks):
-            print(f"正在处理第 {i+1}/{len(chunks)} 个文本块...")
-            print(f"块内容预览: {chunk[:100]}...")
-            
-            sections = self.extract_structured_content(chunk)
+        for i, (chunk, sections) in enumerate(zip(chunks, chunk_sections)):
+            print(f"第 {i+1}/{len(chunks)} 个文本块预览: {chunk[:100]}...")
             if sections:
                 all_sections.extend(sections)
                 print(f"从第 {i+1} 个块提取到 {len(sections)} 个章节")
             else:
                 print(f"第 {i+1} 个块未提取到有效章节")
         
+        if self._cache_db is not None:
+            print(f"缓存命中 {self.cache_hits} 次，未命中 {self.cache_misses} 次")
+        
         # 合并和清理
         final_sections = self.merge_and_clean_sections(all_sections)
         print(f"最终提取到 {len(final_sections)} 个章节")
         
         # 保存JSON文件
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(final_sections, f, ensure_ascii=False, indent=2)
+            # orjson 直接输出 UTF-8 字节（中文不转义），与 json.dump(..., ensure_ascii=False, indent=2) 的格式一致
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(final_sections, option=orjson.OPT_INDENT_2))
             print(f"成功保存到: {output_path}")
             return True
         except Exception as e:
             print(f"保存JSON文件失败: {e}")
             return False
     
+    def convert_directory(self, pdf_dir: str, output_dir: str, workers: Optional[int] = None,
+                          progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, bool]:
+        """将目录下的所有PDF并行转换为同名JSON文件，返回 {PDF文件名: 是否成功}"""
+        pdf_files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))
+        os.makedirs(output_dir, exist_ok=True)
+        results = {}
+        
+        # 每个文件在独立的进程中转换（PyMuPDF 不支持多线程共用），进程内各自创建转换器
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = {
+                executor.submit(
+                    _convert_file,
+                    os.path.join(pdf_dir, pdf_file),
+                    os.path.join(output_dir, os.path.splitext(pdf_file)[0] + '.json'),
+                    self.max_concurrency, self.cache_path, self.cache_ttl_seconds
+                ): pdf_file
+                for pdf_file in pdf_files
+            }
+            for future in as_completed(futures):
+                pdf_file = futures[future]
+                try:
+                    results[pdf_file] = future.result()
+                except Exception as e:
+                    print(f"转换 {pdf_file} 失败: {e}")
+                    results[pdf_file] = False
+                if progress_callback:
+                    progress_callback(len(results), len(pdf_files))
+        
+        print(f"批量转换完成：成功 {sum(results.values())}/{len(pdf_files)} 个文件")
+        return results
+    
     def debug_text_structure(self, text: str):
         """调试文本结构"""
         print("=== 文本结构调试 ===")
         print(f"总长度: {len(text)}")
         
         # 查找章节编号
-        section_numbers = re.findall(r'\d+\.\d+(?:\.\d+)*', text)
+        section_numbers = _SECTION_NUM.findall(text)
         print(f"找到的章节编号: {section_numbers}")
         
         # 显示前500个字符
@@ -325,12 +448,19 @@ class PDFToJSONConverter:
         
         # 按行分割，显示包含数字的行
         lines = text.split('\n')
-        numbered_lines = [line for line in lines if re.search(r'\d+\.\d+', line)]
+        numbered_lines = [line for line in lines if _HAS_SECTION_NUM.search(line)]
         print(f"包含章节编号的行数: {len(numbered_lines)}")
         for i, line in enumerate(numbered_lines[:10]):  # 显示前10行
             print(f"  {i+1}: {line}")
 
 
+def _convert_file(pdf_path: str, output_path: str, max_concurrency: int,
+                  cache_path: Optional[str], cache_ttl_seconds: float) -> bool:
+    """convert_directory 的子进程入口"""
+    converter = PDFToJSONConverter(max_concurrency, cache_path, cache_ttl_seconds)
+    return converter.convert_pdf_to_json(pdf_path, output_path)
+
+
 def main():
     """主函数 - 使用示例"""
     converter = PDFToJSONConverter()
@@ -8,9 +8,10 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(o
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from backend.agents.question_agent import QuestionAgent
+from backend.agents.question_agent import QuestionAgent, QuestionPool
 from backend.components.llm_connector import LLMConnector
 from backend.components.data_loader import DataLoader
+from backend.components.response_cache import ResponseCache
 
 # Mock data for testing
 MOCK_DOCUMENT_CONTENT = [
@@ -46,31 +47,118 @@ def run_question_agent_tests():
     mock_data_loader.save_question_bank.side_effect = lambda filename, questions: f"mock_path/question_dataset/{filename}"
 
     # Configure mock_llm_connector behavior for question generation
-    # 提供模拟的LLM原始JSON字符串
-    mock_llm_raw_responses = [
-        json.dumps({"question": "指示灯中，红色脉冲指示灯的用途是什么？", "options": ["A. 表示电能表故障", "B. 计量有功电能时闪烁", "C. 负荷开关分断时亮"], "answer": "B"}),
-        json.dumps({"question": "停电后，电能表液晶显示可通过红外唤醒。", "answer": "错误"}),
-        json.dumps({"question": "请阐述电能表外形尺寸的两种规格及其适用范围。", "answer": "电能表外形尺寸有两种规格：规格1为160mm×112mm×58mm，适用于远程不带通信模块的单相费控电能表；规格2为160mm×112mm×71mm，适用于其他类型的单相费控电能表。"}),
-        json.dumps({"question": "关于采样元件的固定方式，以下哪种是不允许的？", "options": ["A. 硬连接固定在端子上", "B. 焊接方式固定在线路板上", "C. 胶类物质或捆扎方式固定"], "answer": "C"}),
-        json.dumps({"question": "线路板表面应清洗干净，不得有明显的污渍和焊迹，且无需做绝缘处理。", "answer": "错误"}),
-        json.dumps({"question": "请描述电能表线路板的材料和工艺要求。", "answer": "线路板须用耐氧化、耐腐蚀的双面/多层敷铜环氧树脂板，并具有电能表生产厂家的标识。表面应清洗干净，不得有明显的污渍和焊迹，应做绝缘、防腐处理。所有元器件均能防锈蚀、防氧化，紧固点牢靠。电子元器件（除电源器件外）宜使用贴片元件，使用表面贴装工艺生产。焊接应采用回流焊、波峰焊工艺。"})
+    # 模拟的LLM响应（已解析的题目列表），原始JSON字符串只序列化一次
+    mock_llm_parsed_responses = [
+        [
+            {"question": "指示灯中，红色脉冲指示灯的用途是什么？", "options": ["A. 表示电能表故障", "B. 计量有功电能时闪烁", "C. 负荷开关分断时亮"], "answer": "B"},
+            {"question": "停电后，电能表液晶显示可通过红外唤醒。", "answer": "错误"}
+        ],
+        [
+            {"question": "请阐述电能表外形尺寸的两种规格及其适用范围。", "answer": "电能表外形尺寸有两种规格：规格1为160mm×112mm×58mm，适用于远程不带通信模块的单相费控电能表；规格2为160mm×112mm×71mm，适用于其他类型的单相费控电能表。"},
+            {"question": "关于采样元件的固定方式，以下哪种是不允许的？", "options": ["A. 硬连接固定在端子上", "B. 焊接方式固定在线路板上", "C. 胶类物质或捆扎方式固定"], "answer": "C"}
+        ],
+        [
+            {"question": "线路板表面应清洗干净，不得有明显的污渍和焊迹，且无需做绝缘处理。", "answer": "错误"},
+            {"question": "请描述电能表线路板的材料和工艺要求。", "answer": "线路板须用耐氧化、耐腐蚀的双面/多层敷铜环氧树脂板，并具有电能表生产厂家的标识。表面应清洗干净，不得有明显的污渍和焊迹，应做绝缘、防腐处理。所有元器件均能防锈蚀、防氧化，紧固点牢靠。电子元器件（除电源器件外）宜使用贴片元件，使用表面贴装工艺生产。焊接应采用回流焊、波峰焊工艺。"}
+        ]
     ]
-    mock_llm_connector.generate_text.side_effect = mock_llm_raw_responses
+    mock_llm_raw_responses = [json.dumps(response) for response in mock_llm_parsed_responses]
+    mock_llm_parsed_by_raw = dict(zip(mock_llm_raw_responses, mock_llm_parsed_responses))
+    # generate_text_many 按顺序为每个提示词返回一条模拟响应
+    mock_llm_responses_iter = iter(mock_llm_raw_responses)
+    mock_llm_prompt_count = []
+    mock_llm_system_prompts = []
+    def mock_generate_text_many(prompts, **kwargs):
+        mock_llm_prompt_count.append(len(prompts))
+        mock_llm_system_prompts.extend(kwargs.get('system_prompts') or [])
+        return [next(mock_llm_responses_iter, None) for _ in prompts]
+    mock_llm_connector.generate_text_many.side_effect = mock_generate_text_many
 
-    # 关键修改：直接模拟 parse_..._json 方法返回带有 'type' 的完整字典，
-    # 模拟其真实行为，即它们会添加 'type' 字段。
-    mock_llm_connector.parse_single_choice_json.side_effect = lambda content: {
-        'type': 'single_choice', **json.loads(content)} if content else None
-    mock_llm_connector.parse_judge_json.side_effect = lambda content: {
-        'type': 'judge', **json.loads(content)} if content else None
-    mock_llm_connector.parse_subjective_json.side_effect = lambda content: {
-        'type': 'subjective', **json.loads(content)} if content else None
+    # 直接模拟 parse_questions_json 返回带有 'type' 的题目列表，
+    # 模拟其真实行为，即它会为数组中的每道题添加 'type' 字段（直接查表取预先解析好的题目，不再反序列化）。
+    mock_llm_connector.parse_questions_json.side_effect = lambda content, question_type: [
+        {'type': question_type, **q} for q in mock_llm_parsed_by_raw[content]] if content else []
 
     # Initialize QuestionAgent
     question_agent = QuestionAgent(mock_llm_connector, mock_data_loader)
 
     # ... (Test Case 1 和 Test Case 2 保持不变) ...
 
+    # Test Case 3: _is_similar_question against a QuestionPool built from the existing bank
+    print("\n--- Test 3: _is_similar_question ---")
+    similarity_pool = QuestionPool(MOCK_EXISTING_QUESTIONS)
+    near_duplicate_judge = {"type": "judge", "question": "根据技术规范，表座可以使用回收材料制作！", "answer": "错误"}
+    print(f"Input: Question='{near_duplicate_judge['question']}'")
+    is_similar = question_agent._is_similar_question(near_duplicate_judge, similarity_pool)
+    print(f"Output: {is_similar}") # Expected: True
+    assert is_similar is True
+
+    # A verbatim repeat is caught by the exact-text index without running cdist
+    with patch('backend.agents.question_agent.process.cdist') as mock_cdist:
+        assert question_agent._is_similar_question(dict(MOCK_EXISTING_QUESTIONS[0]), similarity_pool) is True
+        mock_cdist.assert_not_called()
+
+    # Same text but a different type is never compared
+    same_text_other_type = {"type": "subjective", "question": near_duplicate_judge['question'], "answer": "错误"}
+    assert question_agent._is_similar_question(same_text_other_type, similarity_pool) is False
+
+    # Single choice: similar text alone is not enough, at least one option must be similar too
+    same_question_new_options = {**MOCK_EXISTING_QUESTIONS[2], "options": ["A. 完全不同的选项", "B. 另一个选项"]}
+    print(f"Input: Question='{same_question_new_options['question']}', Options={same_question_new_options['options']}")
+    is_similar = question_agent._is_similar_question(same_question_new_options, similarity_pool)
+    print(f"Output: {is_similar}") # Expected: False
+    assert is_similar is False
+    assert question_agent._is_similar_question(dict(MOCK_EXISTING_QUESTIONS[2]), similarity_pool) is True
+
+    # Test Case 4: generate_questions (each LLM call returns several questions, calls of one round are sent as one batch)
+    print("\n--- Test 4: generate_questions ---")
+    print("Input: filename='单相智能电能表形式规范.json', count=2")
+    progress_reports = []
+    generated = question_agent.generate_questions("单相智能电能表形式规范.json", 2,
+                                                  progress_callback=lambda done, total: progress_reports.append((done, total)))
+    print(f"Output: {[q['question'] for q in generated]}") # Expected: 2 questions
+    assert len(generated) == 2
+    # 每轮生成结束后报告一次进度
+    assert progress_reports == [(2, 2)]
+    assert [q['idx'] for q in generated] == [1, 2]
+    assert all(q['source_file'] == "单相智能电能表形式规范.json" for q in generated)
+    # count=2 fits in one call per (item, type), so the round needs 2 calls instead of 4, sent as one batch
+    assert mock_llm_prompt_count == [2]
+    # 静态的出题要求作为 system 消息发送，每个提示词各有一条
+    assert len(mock_llm_system_prompts) == 2 and all(mock_llm_system_prompts)
+
+    # Test Case 5: save_question_bank merges into the existing bank and drops exact duplicates
+    print("\n--- Test 5: save_question_bank ---")
+    new_questions = [dict(MOCK_EXISTING_QUESTIONS[0]), generated[0]]
+    print(f"Input: source_filename='单相智能电能表形式规范.json', {len(new_questions)} new questions (1 duplicate)")
+    saved_name = question_agent.save_question_bank("单相智能电能表形式规范.json", new_questions)
+    print(f"Output: '{saved_name}'") # Expected: '单相智能电能表形式规范题库.json'
+    assert saved_name == "单相智能电能表形式规范题库.json"
+    saved_questions = mock_data_loader.save_question_bank.call_args[0][1]
+    assert len(saved_questions) == len(MOCK_EXISTING_QUESTIONS) + 1
+    assert [q['idx'] for q in saved_questions] == list(range(1, len(saved_questions) + 1))
+
+    # A caller that already holds the bank can pass it in, so it is not loaded again
+    mock_data_loader.load_question_bank_by_name.reset_mock()
+    question_agent.save_question_bank("单相智能电能表形式规范.json", [generated[1]], existing_questions=list(MOCK_EXISTING_QUESTIONS))
+    mock_data_loader.load_question_bank_by_name.assert_not_called()
+    assert len(mock_data_loader.save_question_bank.call_args[0][1]) == len(MOCK_EXISTING_QUESTIONS) + 1
+
+    # Test Case 6: questions left in the response cache are used before calling the LLM
+    print("\n--- Test 6: generate_questions with a response cache ---")
+    mock_response_cache = MagicMock(spec=ResponseCache)
+    cached_texts = iter(["采样元件不得使用胶类物质固定。", "跳闸指示灯在负荷开关分断时亮起。", "液晶显示关闭后可用按键唤醒。", "规格2的厚度为71mm。"])
+    mock_response_cache.take.side_effect = lambda question_type, item, count: [
+        {'type': 'judge', 'question': next(cached_texts), 'answer': '正确'} for _ in range(count)]
+    cached_agent = QuestionAgent(mock_llm_connector, mock_data_loader, response_cache=mock_response_cache)
+    mock_llm_connector.generate_text_many.reset_mock()
+    generated = cached_agent.generate_questions("单相智能电能表形式规范.json", 2)
+    print(f"Output: {[q['question'] for q in generated]}") # Expected: the first 2 cached questions
+    assert [q['question'] for q in generated] == ["采样元件不得使用胶类物质固定。", "跳闸指示灯在负荷开关分断时亮起。"]
+    mock_llm_connector.generate_text_many.assert_not_called()
+    # The second request's questions were not needed, so they go back into the cache
+    assert [q['question'] for q in mock_response_cache.add.call_args[0][2]] == ["液晶显示关闭后可用按键唤醒。", "规格2的厚度为71mm。"]
+
     print("\n--- QuestionAgent tests completed ---")
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import os
 import sys
+import asyncio
 from unittest.mock import MagicMock, patch
 
 # Add project root to Python path to ensure imports work correctly
@@ -92,6 +93,28 @@ def run_quiz_agent_tests():
     print(f"Output: {is_correct_subj_not_similar}") # Expected: False (due to mock)
     assert is_correct_subj_not_similar is False
 
+    # Test Case 8: check_answers - mixed batch, subjective answers judged concurrently
+    print("\n--- Test 8: check_answers ---")
+    mock_llm_connector.judge_subjective_answer_with_llm.side_effect = lambda correct_answer, user_answer: (
+        (True, 90) if 'photosynthesis' in user_answer.lower() else (False, 10))
+    qa_pairs = [
+        (question_sc, "B"),
+        (question_subj, user_answer_subj_similar),
+        (question_judge, "错误"),
+        (question_subj, user_answer_subj_not_similar),
+    ]
+    print(f"Input: {len(qa_pairs)} answers (2 subjective)")
+    results = quiz_agent.check_answers(qa_pairs)
+    print(f"Output: {results}") # Expected: [True, True, False, False]
+    assert results == [True, True, False, False]
+
+    # 在已有事件循环的线程中调用时（asyncio.run 不可用），主观题逐个判定，结果相同
+    async def check_answers_in_running_loop():
+        return quiz_agent.check_answers(qa_pairs)
+    results = asyncio.run(check_answers_in_running_loop())
+    print(f"Output (inside a running event loop): {results}") # Expected: [True, True, False, False]
+    assert results == [True, True, False, False]
+
     print("\n--- QuizAgent tests completed ---")
 
 if __name__ == "__main__":
@@ -1,6 +1,9 @@
 import os
 import sys
+import io
 import json
+import shutil
+import tempfile
 from unittest.mock import MagicMock, patch
 
 # Add project root to Python path to ensure imports work correctly
@@ -10,50 +13,22 @@ if project_root not in sys.path:
 
 from backend.components.data_loader import DataLoader
 
-# Define mock data paths for testing
-MOCK_BASE_DATA_DIR = os.path.join(project_root, 'test_data_loader_temp')
-MOCK_RAW_FILE_DIR = os.path.join(MOCK_BASE_DATA_DIR, 'raw_files')
-MOCK_QUESTION_DATASET_DIR = os.path.join(MOCK_BASE_DATA_DIR, 'question_dataset')
-
-def setup_mock_dirs():
-    """Create mock directories for testing."""
-    os.makedirs(MOCK_RAW_FILE_DIR, exist_ok=True)
-    os.makedirs(MOCK_QUESTION_DATASET_DIR, exist_ok=True)
-
-def cleanup_mock_dirs():
-    """Clean up mock directories after testing."""
-    import shutil
-    if os.path.exists(MOCK_BASE_DATA_DIR):
-        shutil.rmtree(MOCK_BASE_DATA_DIR)
-
 def run_data_loader_tests():
     """
     Demonstrates the interface and functionality of the DataLoader class.
+    Works on real files in a temporary data directory that is removed afterwards.
     """
     print("--- Testing DataLoader ---")
 
-    cleanup_mock_dirs() # Ensure clean state
-    setup_mock_dirs()
-
-    # 在patch之前保存原始的os.path.join引用
-    _original_os_path_join = os.path.join
-
-    with patch('os.path.join', side_effect=lambda base, *args:
-               # 在这里使用保存的原始os.path.join引用，而不是被patch后的os.path.join
-               _original_os_path_join(MOCK_BASE_DATA_DIR, *args) if base == 'data' else _original_os_path_join(base, *args)), \
-         patch('os.makedirs', return_value=None) as mock_makedirs, \
-         patch('os.listdir', side_effect=lambda path: 
-                # 模拟 os.listdir 以便 get_uploaded_files 和 get_question_banks 能找到文件
-                ['test_doc.json'] if path == MOCK_RAW_FILE_DIR else
-                ['test_bank.json'] if path == MOCK_QUESTION_DATASET_DIR else
-                []
-            ): # 模拟makedirs避免实际创建
-        
-        data_loader = DataLoader()
+    base_data_dir = tempfile.mkdtemp()
+    raw_file_dir = os.path.join(base_data_dir, 'raw_files')
+    question_dataset_dir = os.path.join(base_data_dir, 'question_dataset')
+    try:
+        data_loader = DataLoader(base_data_dir)
 
-        # 确保目录被尝试创建（通过mock_makedirs验证）
-        mock_makedirs.assert_any_call(MOCK_RAW_FILE_DIR, exist_ok=True)
-        mock_makedirs.assert_any_call(MOCK_QUESTION_DATASET_DIR, exist_ok=True)
+        # 初始化时应创建原始文档和题库目录
+        assert os.path.isdir(raw_file_dir)
+        assert os.path.isdir(question_dataset_dir)
 
         # Test Case 1: validate_json_format
         print("\n--- Test 1: validate_json_format ---")
@@ -68,36 +43,42 @@ def run_data_loader_tests():
         print(f"Input (Invalid): {invalid_json_data[0]}")
         is_invalid = data_loader.validate_json_format(invalid_json_data)
         print(f"Output (Invalid): {is_invalid}") # Expected: False
+        assert is_valid is True
+        assert is_invalid is False
+        assert data_loader.validate_json_format([{"idx": 1.1, "title": "Title 1", "text": "Text 1"}]) is False # idx must be a string
+        assert data_loader.validate_json_format({"idx": "1.1", "title": "Title 1", "text": "Text 1"}) is False # top level must be a list
 
         # Test Case 2: save_uploaded_file and get_uploaded_files
         print("\n--- Test 2: save_uploaded_file and get_uploaded_files ---")
-        mock_uploaded_file = MagicMock()
+        # Streamlit 的 UploadedFile 是带 name 属性的 BytesIO
+        mock_uploaded_file = io.BytesIO(json.dumps(valid_json_data, ensure_ascii=False).encode('utf-8'))
         mock_uploaded_file.name = "test_doc.json"
-        mock_uploaded_file.getvalue.return_value = json.dumps(valid_json_data, ensure_ascii=False).encode('utf-8')
         
-        # 模拟文件写入操作
-        with patch('builtins.open', MagicMock()) as mock_open:
-            print(f"Input (save_uploaded_file): uploaded_file.name='{mock_uploaded_file.name}'")
-            saved_path = data_loader.save_uploaded_file(mock_uploaded_file)
-            print(f"Output (save_uploaded_file): Saved to '{saved_path}'")
-            mock_open.assert_called_once_with(_original_os_path_join(MOCK_RAW_FILE_DIR, "test_doc.json"), 'wb') # 使用原始的join
-
+        print(f"Input (save_uploaded_file): uploaded_file.name='{mock_uploaded_file.name}'")
+        saved_path = data_loader.save_uploaded_file(mock_uploaded_file)
+        print(f"Output (save_uploaded_file): Saved to '{saved_path}'")
+        assert saved_path == os.path.join(raw_file_dir, "test_doc.json")
+        with open(saved_path, 'rb') as f:
+            assert f.read() == mock_uploaded_file.getvalue()
+
+        # get_uploaded_files 直接扫描目录，load_document 会按 mtime 缓存解析结果
         uploaded_files = data_loader.get_uploaded_files()
         print(f"Output (get_uploaded_files): {uploaded_files}") # Expected: ['test_doc.json']
+        assert uploaded_files == ["test_doc.json"]
 
         # Test Case 3: load_document
         print("\n--- Test 3: load_document ---")
-        # 模拟文件读取操作
-        with patch('builtins.open', MagicMock(
-            return_value=MagicMock(__enter__=MagicMock(return_value=MagicMock(
-                read=MagicMock(return_value=json.dumps(valid_json_data))
-            )), __exit__=MagicMock())
-        )), \
-        patch('os.path.exists', return_value=True): # 模拟文件存在
-            doc_content = data_loader.load_document("test_doc.json")
-            print(f"Input (load_document): 'test_doc.json'")
-            print(f"Output (load_document): {doc_content[:1]}...") # Expected: content of test_doc.json
-            assert doc_content == valid_json_data
+        doc_content = data_loader.load_document("test_doc.json")
+        print(f"Input (load_document): 'test_doc.json'")
+        print(f"Output (load_document): {doc_content[:1]}...") # Expected: content of test_doc.json
+        assert doc_content == valid_json_data
+
+        # 文件未修改时再次加载应直接命中缓存，不再打开文件
+        with patch('builtins.open', MagicMock()) as mock_open:
+            cached_doc_content = data_loader.load_document("test_doc.json")
+            mock_open.assert_not_called()
+        print(f"Output (load_document, cached): {cached_doc_content[:1]}...")
+        assert cached_doc_content == valid_json_data
 
         # Test Case 4: save_question_bank and get_question_banks
         print("\n--- Test 4: save_question_bank and get_question_banks ---")
@@ -108,45 +89,37 @@ def run_data_loader_tests():
         ]
         question_bank_name = "test_bank.json"
         
-        # 模拟题库文件写入
-        with patch('builtins.open', MagicMock()) as mock_open:
-            print(f"Input (save_question_bank): '{question_bank_name}', {len(mock_questions)} questions")
-            saved_bank_path = data_loader.save_question_bank(question_bank_name, mock_questions)
-            print(f"Output (save_question_bank): Saved to '{saved_bank_path}'")
-            mock_open.assert_called_once_with(_original_os_path_join(MOCK_QUESTION_DATASET_DIR, question_bank_name), 'w', encoding='utf-8') # 使用原始的join
+        # 真实写入题库文件：先写入临时文件，再用 os.replace 原子替换
+        print(f"Input (save_question_bank): '{question_bank_name}', {len(mock_questions)} questions")
+        saved_bank_path = data_loader.save_question_bank(question_bank_name, mock_questions)
+        print(f"Output (save_question_bank): Saved to '{saved_bank_path}'")
+        assert saved_bank_path == os.path.join(question_dataset_dir, question_bank_name)
+        assert not os.path.exists(saved_bank_path + '.tmp')
 
         question_banks = data_loader.get_question_banks()
         print(f"Output (get_question_banks): {question_banks}") # Expected: ['test_bank']
+        assert question_banks == ["test_bank"]
 
         # Test Case 5: load_question_bank_by_name
         print("\n--- Test 5: load_question_bank_by_name ---")
-        # 模拟题库文件读取
-        with patch('builtins.open', MagicMock(
-            return_value=MagicMock(__enter__=MagicMock(return_value=MagicMock(
-                read=MagicMock(return_value=json.dumps(mock_questions))
-            )), __exit__=MagicMock())
-        )), \
-        patch('os.path.exists', return_value=True): # 模拟文件存在
-            loaded_bank = data_loader.load_question_bank_by_name("test_bank")
-            print(f"Input (load_question_bank_by_name): 'test_bank'")
-            print(f"Output (load_question_bank_by_name): {loaded_bank[:1]}...") # Expected: content of test_bank.json
-            assert loaded_bank == mock_questions
+        loaded_bank = data_loader.load_question_bank_by_name("test_bank")
+        print(f"Input (load_question_bank_by_name): 'test_bank'")
+        print(f"Output (load_question_bank_by_name): {loaded_bank[:1]}...") # Expected: content of test_bank.json
+        assert loaded_bank == mock_questions
 
         # Test Case 6: load_questions_for_quiz
         print("\n--- Test 6: load_questions_for_quiz ---")
-        # 模拟题库文件读取
-        with patch('builtins.open', MagicMock(
-            return_value=MagicMock(__enter__=MagicMock(return_value=MagicMock(
-                read=MagicMock(return_value=json.dumps(mock_questions))
-            )), __exit__=MagicMock())
-        )), \
-        patch('os.path.exists', return_value=True): # 模拟文件存在
+        # 题库文件已在 Test 5 中写入且未修改，应直接复用缓存的解析结果，不再打开文件
+        with patch('builtins.open', MagicMock()) as mock_open:
             quiz_questions = data_loader.load_questions_for_quiz("test_bank", 2)
-            print(f"Input (load_questions_for_quiz): 'test_bank', count=2")
-            print(f"Output (load_questions_for_quiz): {len(quiz_questions)} questions loaded") # Expected: 2 questions
-            assert len(quiz_questions) == 2
+            mock_open.assert_not_called()
+        print(f"Input (load_questions_for_quiz): 'test_bank', count=2")
+        print(f"Output (load_questions_for_quiz): {len(quiz_questions)} questions loaded") # Expected: 2 questions
+        assert len(quiz_questions) == 2
+        assert all(q in mock_questions for q in quiz_questions)
+    finally:
+        shutil.rmtree(base_data_dir, ignore_errors=True)
 
-    cleanup_mock_dirs()
     print("\n--- DataLoader tests completed ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+import os
+import sys
+
+# Add project root to Python path to ensure imports work correctly
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.components.json_utils import extract_json_block, load_json_block, JsonObjectStreamParser
+
+def run_json_utils_tests():
+    """
+    Demonstrates the interface and functionality of extract_json_block.
+    """
+    print("--- Testing json_utils ---")
+
+    # Test Case 1: object surrounded by prose
+    print("\n--- Test 1: extract_json_block (object) ---")
+    content = '好的，题目如下：\n{"question": "问题内容", "answer": "正确"}\n希望对你有帮助。'
+    block = extract_json_block(content)
+    print(f"Output: {block}") # Expected: the object only
+    assert block == '{"question": "问题内容", "answer": "正确"}'
+
+    # Test Case 2: only the first of two objects is taken (a greedy regex would span both)
+    print("\n--- Test 2: extract_json_block (two objects) ---")
+    content = '{"question": "Q1", "answer": "A"} 另一个示例: {"question": "Q2", "answer": "B"}'
+    block = extract_json_block(content)
+    print(f"Output: {block}") # Expected: the first object
+    assert block == '{"question": "Q1", "answer": "A"}'
+
+    # Test Case 3: brackets and escaped quotes inside strings do not change the depth
+    print("\n--- Test 3: extract_json_block (brackets in strings) ---")
+    content = '[{"question": "集合 {a, b] 与 \\"c}\\" 的关系", "options": ["A. x\\\\", "B. ]"], "answer": "A"}] trailing ]'
+    block = extract_json_block(content, '[')
+    print(f"Output: {block}") # Expected: everything up to the array's closing bracket
+    assert block == content[:content.rindex('}]') + 2]
+
+    # Test Case 4: no block, or an unterminated one
+    print("\n--- Test 4: extract_json_block (missing / truncated) ---")
+    assert extract_json_block('no json here') is None
+    assert extract_json_block('{"question": "truncated output') is None
+
+    # Test Case 5: load_json_block parses a bare JSON-mode response directly and falls back to extraction
+    print("\n--- Test 5: load_json_block ---")
+    judgment = load_json_block('  {"similarity_score": 85, "is_similar": true}\n')
+    print(f"Output: {judgment}") # Expected: {'similarity_score': 85, 'is_similar': True}
+    assert judgment == {"similarity_score": 85, "is_similar": True}
+    assert load_json_block('结果：[{"question": "Q1", "answer": "A"}] 以上。', '[') == [{"question": "Q1", "answer": "A"}]
+    assert load_json_block('no json here') is None
+
+    # Test Case 6: JsonObjectStreamParser reports each top-level member as soon as it is complete
+    print("\n--- Test 6: JsonObjectStreamParser ---")
+    content = '好的：{"question": "关于{a, b}的说法", "options": ["A. x", "B, y"], "answer": "A"} 以上。'
+    parser = JsonObjectStreamParser()
+    split = content.index('"options"')
+    # The question is delivered before the rest of the object has arrived
+    members = parser.feed(content[:split])
+    assert members == [("question", "关于{a, b}的说法")]
+    for i in range(split, len(content), 4): # Feed the rest in 4-character chunks like streamed tokens
+        members.extend(parser.feed(content[i:i + 4]))
+    print(f"Output: {members}")
+    assert members == [("question", "关于{a, b}的说法"), ("options", ["A. x", "B, y"]), ("answer", "A")]
+    assert parser.done
+
+    print("\n--- json_utils tests completed ---")
+
+if __name__ == "__main__":
+    run_json_utils_tests()
@@ -1,7 +1,8 @@
 import os
 import sys
 import json
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
 
 # Add project root to Python path to ensure imports work correctly
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -10,6 +11,32 @@ if project_root not in sys.path:
 
 from backend.components.llm_connector import LLMConnector
 
+# Raw LLM outputs for the parse tests, serialized once (compact) from Python literals
+_FIXTURES = {name: json.dumps(data, ensure_ascii=False, separators=(',', ':')) for name, data in {
+    'single_choice': {
+        "question": "Which of the following is an input device?",
+        "options": ["A. Monitor", "B. Keyboard", "C. Printer"],
+        "answer": "B"
+    },
+    'judge': {
+        "question": "The sun revolves around the Earth.",
+        "answer": "错误"
+    },
+    'subjective': {
+        "question": "Explain the concept of photosynthesis.",
+        "answer": "Photosynthesis is the process by which green plants and some other organisms use sunlight to synthesize foods with the help of chlorophyll."
+    },
+}.items()}
+
+# Raw LLM similarity judgments for the subjective-answer tests
+_SIM_HIGH = json.dumps({"similarity_score": 85, "is_similar": True})
+_SIM_LOW = json.dumps({"similarity_score": 40, "is_similar": False})
+
+def _resp(content, status_code=200):
+    """Builds a dashscope-style response with a single choice holding `content`."""
+    return SimpleNamespace(status_code=status_code, message='' if status_code == 200 else 'Mocked error',
+                           output=SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))]))
+
 def run_llm_connector_tests():
     """
     Demonstrates the interface and functionality of the LLMConnector class.
@@ -19,13 +46,10 @@ def run_llm_connector_tests():
 
     # Mock the dashscope.Generation.call method
     with patch('dashscope.Generation.call') as mock_llm_call:
-        llm_connector = LLMConnector()
+        llm_connector = LLMConnector(provider='dashscope')
 
         # Mock LLM response for generate_text
-        mock_response_obj = MagicMock()
-        mock_response_obj.status_code = 200
-        mock_response_obj.output.choices = [MagicMock()]
-        mock_response_obj.output.choices[0].message.content = "Mocked LLM response content."
+        mock_response_obj = _resp("Mocked LLM response content.")
         mock_llm_call.return_value = mock_response_obj
 
         # Test Case 1: generate_text
@@ -36,45 +60,33 @@ def run_llm_connector_tests():
         print(f"Output (generate_text): '{generated_text}'") # Expected: "Mocked LLM response content."
         assert generated_text == "Mocked LLM response content."
 
+        # 相同的请求直接命中响应缓存，不再调用 LLM
+        generated_text = llm_connector.generate_text(test_prompt)
+        print(f"Output (generate_text, repeated): '{generated_text}', cache_stats={llm_connector.cache_stats}")
+        assert generated_text == "Mocked LLM response content."
+        assert mock_llm_call.call_count == 1
+        assert llm_connector.cache_stats['hits'] == 1
+
         # Test Case 2: parse_single_choice_json
         print("\n--- Test 2: parse_single_choice_json ---")
-        mock_single_choice_json_str = """
-        {
-            "question": "Which of the following is an input device?",
-            "options": ["A. Monitor", "B. Keyboard", "C. Printer"],
-            "answer": "B"
-        }
-        """
         print(f"Input (parse_single_choice_json): JSON string")
-        parsed_single_choice = llm_connector.parse_single_choice_json(mock_single_choice_json_str)
+        parsed_single_choice = llm_connector.parse_single_choice_json(_FIXTURES['single_choice'])
         print(f"Output (parse_single_choice_json): {parsed_single_choice}")
         assert parsed_single_choice['type'] == 'single_choice'
         assert parsed_single_choice['question'] == "Which of the following is an input device?"
 
         # Test Case 3: parse_judge_json
         print("\n--- Test 3: parse_judge_json ---")
-        mock_judge_json_str = """
-        {
-            "question": "The sun revolves around the Earth.",
-            "answer": "错误"
-        }
-        """
         print(f"Input (parse_judge_json): JSON string")
-        parsed_judge = llm_connector.parse_judge_json(mock_judge_json_str)
+        parsed_judge = llm_connector.parse_judge_json(_FIXTURES['judge'])
         print(f"Output (parse_judge_json): {parsed_judge}")
         assert parsed_judge['type'] == 'judge'
         assert parsed_judge['question'] == "The sun revolves around the Earth."
 
         # Test Case 4: parse_subjective_json
         print("\n--- Test 4: parse_subjective_json ---")
-        mock_subjective_json_str = """
-        {
-            "question": "Explain the concept of photosynthesis.",
-            "answer": "Photosynthesis is the process by which green plants and some other organisms use sunlight to synthesize foods with the help of chlorophyll."
-        }
-        """
         print(f"Input (parse_subjective_json): JSON string")
-        parsed_subjective = llm_connector.parse_subjective_json(mock_subjective_json_str)
+        parsed_subjective = llm_connector.parse_subjective_json(_FIXTURES['subjective'])
         print(f"Output (parse_subjective_json): {parsed_subjective}")
         assert parsed_subjective['type'] == 'subjective'
         assert parsed_subjective['question'] == "Explain the concept of photosynthesis."
@@ -103,10 +115,7 @@ def run_llm_connector_tests():
 
         # Test Case 8: judge_subjective_answer_with_llm (mocking LLM response for judgment)
         print("\n--- Test 8: judge_subjective_answer_with_llm ---")
-        mock_llm_call.return_value.output.choices[0].message.content = json.dumps({
-            "similarity_score": 85,
-            "is_similar": True
-        })
+        mock_llm_call.return_value = _resp(_SIM_HIGH)
         correct_ans = "Photosynthesis is the process by which green plants convert light energy into chemical energy."
         user_ans = "Green plants use sunlight to make food through photosynthesis."
         print(f"Input (judge_subjective_answer_with_llm): Correct='{correct_ans}', User='{user_ans}'")
@@ -115,16 +124,88 @@ def run_llm_connector_tests():
         assert is_similar is True
         assert score == 85
 
-        mock_llm_call.return_value.output.choices[0].message.content = json.dumps({
-            "similarity_score": 40,
-            "is_similar": False
-        })
+        mock_llm_call.return_value = _resp(_SIM_LOW)
         is_similar, score = llm_connector.judge_subjective_answer_with_llm(correct_ans, "This is a completely different answer.")
         print(f"Input (judge_subjective_answer_with_llm): Correct='{correct_ans}', User='This is a completely different answer.'")
         print(f"Output (judge_subjective_answer_with_llm): Is_similar={is_similar}, Score={score}")
         assert is_similar is False
         assert score == 40
 
+        # Test Case 9: parse_questions_json
+        print("\n--- Test 9: parse_questions_json ---")
+        mock_questions_json_str = """
+        [
+            {"question": "The sun revolves around the Earth.", "answer": "错误"},
+            {"question": "Water boils at 100 degrees Celsius at sea level.", "answer": "正确"},
+            {"question": "Missing answer field."}
+        ]
+        """
+        print(f"Input (parse_questions_json): JSON array string, question_type='judge'")
+        parsed_questions = llm_connector.parse_questions_json(mock_questions_json_str, 'judge')
+        print(f"Output (parse_questions_json): {parsed_questions}") # Expected: 2 questions, incomplete one dropped
+        assert [q['type'] for q in parsed_questions] == ['judge', 'judge']
+        assert parsed_questions[0]['question'] == "The sun revolves around the Earth."
+
+        # 字段类型不符的题目同样被丢弃（如 options 是字符串而不是列表）
+        mock_single_choice_json_str = json.dumps([
+            {"question": "What is 1 + 1?", "options": ["A. 1", "B. 2", "C. 3"], "answer": "B"},
+            {"question": "What is 2 + 2?", "options": "A. 3 B. 4 C. 5", "answer": "B"},
+            {"question": "What is 3 + 3?", "options": ["A. 5", "B. 6", "C. 7"], "answer": 2}
+        ])
+        parsed_questions = llm_connector.parse_questions_json(mock_single_choice_json_str, 'single_choice')
+        print(f"Output (parse_questions_json, wrongly typed fields): {parsed_questions}") # Expected: only the first question
+        assert [q['question'] for q in parsed_questions] == ["What is 1 + 1?"]
+
+        # 只要求生成一道题时，LLM 可能直接返回单个题目对象而不是数组；也可能把数组包在 {"questions": [...]} 中
+        parsed_questions = llm_connector.parse_questions_json('{"question": "电能表需要接地。", "answer": "正确"}', 'judge')
+        print(f"Output (parse_questions_json, bare object): {parsed_questions}") # Expected: 1 question
+        assert parsed_questions == [{'type': 'judge', 'question': "电能表需要接地。", 'answer': "正确"}]
+        parsed_questions = llm_connector.parse_questions_json(
+            '```json\n{"question": "What is 1 + 1?", "options": ["A. 1", "B. 2"], "answer": "B"}\n```', 'single_choice')
+        print(f"Output (parse_questions_json, bare single-choice object): {parsed_questions}") # Expected: 1 question, not its options
+        assert [q['question'] for q in parsed_questions] == ["What is 1 + 1?"]
+        parsed_questions = llm_connector.parse_questions_json(
+            '{"questions": [{"question": "Q1", "answer": "正确"}, {"question": "Q2", "answer": "错误"}]}', 'judge')
+        print(f"Output (parse_questions_json, wrapped array): {parsed_questions}") # Expected: 2 questions
+        assert [q['question'] for q in parsed_questions] == ["Q1", "Q2"]
+
+        # Test Case 10: judge_subjective_answer_with_llm (copies of the correct answer are judged locally)
+        print("\n--- Test 10: judge_subjective_answer_with_llm (local match) ---")
+        mock_llm_call.reset_mock()
+        user_ans = "  photosynthesis is the process by which green plants convert light energy into chemical energy "
+        print(f"Input (judge_subjective_answer_with_llm): Correct='{correct_ans}', User='{user_ans}'")
+        is_similar, score = llm_connector.judge_subjective_answer_with_llm(correct_ans, user_ans)
+        print(f"Output (judge_subjective_answer_with_llm): Is_similar={is_similar}, Score={score}") # Expected: True, 100.0
+        assert is_similar is True
+        assert score == 100.0
+        mock_llm_call.assert_not_called()
+
+        # Test Case 11: generate_text (overlong prompts are shortened before they are sent)
+        print("\n--- Test 11: generate_text (prompt length limit) ---")
+        mock_llm_call.return_value = mock_response_obj
+        long_prompt = "生成题目：" + "电能表" * 20000
+        print(f"Input (generate_text): Prompt of {len(long_prompt)} characters, limit={llm_connector.max_prompt_chars}")
+        llm_connector.generate_text(long_prompt, use_cache=False)
+        sent_prompt = mock_llm_call.call_args.kwargs['prompt']
+        print(f"Output: sent {len(sent_prompt)} characters") # Expected: at most the limit, starting with the request
+        assert len(sent_prompt) <= llm_connector.max_prompt_chars
+        assert sent_prompt.startswith("生成题目：") and sent_prompt.endswith("电能表")
+
+        # Test Case 12: generate_text_stream (pieces are yielded as they arrive, empty ones skipped)
+        print("\n--- Test 12: generate_text_stream ---")
+        mock_llm_call.return_value = iter([_resp("Mock"), _resp("ed"), _resp(""), _resp(" resp")])
+        print(f"Input (generate_text_stream): Prompt='{test_prompt}'")
+        pieces = list(llm_connector.generate_text_stream(test_prompt))
+        print(f"Output (generate_text_stream): {pieces}") # Expected: ['Mock', 'ed', ' resp']
+        assert "".join(pieces) == "Mocked resp"
+        assert mock_llm_call.call_args.kwargs['stream'] is True
+
+        # 流式请求中途出错时停止输出
+        mock_llm_call.return_value = iter([_resp("Mock"), _resp(None, status_code=500), _resp("never")])
+        pieces = list(llm_connector.generate_text_stream(test_prompt))
+        print(f"Output (generate_text_stream, failed midway): {pieces}") # Expected: ['Mock']
+        assert pieces == ["Mock"]
+
     print("\n--- LLMConnector tests completed ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Add project root to Python path to ensure imports work correctly
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.components.llm_providers import DashScopeProvider, create_provider
+
+def run_llm_providers_tests():
+    """
+    Demonstrates the interface and functionality of the LLM providers.
+    Mocks the dashscope.Generation.call method to avoid actual API calls.
+    """
+    print("--- Testing LLM providers ---")
+
+    with patch('dashscope.Generation.call') as mock_llm_call:
+        # Test Case 1: create_provider picks the provider by name (case-insensitive)
+        print("\n--- Test 1: create_provider ---")
+        provider = create_provider(" DashScope ")
+        print(f"Output: {type(provider).__name__}, cache_namespace={provider.cache_namespace}") # Expected: DashScopeProvider
+        assert isinstance(provider, DashScopeProvider)
+        assert provider.cache_namespace[0] == 'dashscope'
+
+        # Test Case 2: unknown providers are rejected
+        print("\n--- Test 2: create_provider (unknown name) ---")
+        try:
+            create_provider("unknown")
+            assert False, "Expected ValueError"
+        except ValueError as e:
+            print(f"Output: ValueError('{e}')")
+
+        # Test Case 3: generate_many answers every prompt, in prompt order, with its own system message
+        print("\n--- Test 3: generate_many ---")
+        def mock_call(**kwargs):
+            response = MagicMock()
+            response.status_code = 200
+            messages = kwargs.get('messages')
+            response.output.choices[0].message.content = messages[-1]['content'] if messages else kwargs['prompt']
+            return response
+        mock_llm_call.side_effect = mock_call
+        contents = provider.generate_many(["p1", "p2", "p3"], ["system", None, "system"], max_concurrency=2)
+        print(f"Output: {contents}") # Expected: ['p1', 'p2', 'p3']
+        assert contents == ["p1", "p2", "p3"]
+        # 带 system 提示词的请求以 messages 形式发送
+        assert sum('messages' in call.kwargs for call in mock_llm_call.call_args_list) == 2
+        # 所有请求共用同一个连接池（SDK 支持传入 session 时）
+        sessions = {id(call.kwargs.get('session')) for call in mock_llm_call.call_args_list}
+        assert len(sessions) == 1
+
+    print("\n--- LLM providers tests completed ---")
+
+if __name__ == "__main__":
+    run_llm_providers_tests()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add project root to Python path to ensure imports work correctly
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.components.response_cache import ResponseCache
+
+def run_response_cache_tests():
+    """
+    Demonstrates the interface and functionality of the ResponseCache class.
+    Uses a temporary directory that is removed afterwards.
+    """
+    print("--- Testing ResponseCache ---")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = ResponseCache(cache_dir, namespace='test-model', max_candidates=3)
+        item = {"title": "Photosynthesis", "text": "Photosynthesis converts light energy into chemical energy."}
+        questions = [{"type": "judge", "question": f"Statement {i}", "answer": "正确"} for i in range(4)]
+
+        # Test Case 1: take from an empty cache misses
+        print("\n--- Test 1: take (miss) ---")
+        taken = cache.take('judge', item, 2)
+        print(f"Output: {taken}") # Expected: []
+        assert taken == []
+
+        # Test Case 2: add keeps at most max_candidates, take hands them out once
+        print("\n--- Test 2: add and take ---")
+        cache.add('judge', item, questions)
+        taken = cache.take('judge', item, 2)
+        print(f"Output: {[q['question'] for q in taken]}") # Expected: ['Statement 0', 'Statement 1']
+        assert [q['question'] for q in taken] == ['Statement 0', 'Statement 1']
+        taken = cache.take('judge', item, 2)
+        print(f"Output: {[q['question'] for q in taken]}") # Expected: ['Statement 2']
+        assert [q['question'] for q in taken] == ['Statement 2']
+        assert cache.take('judge', item, 2) == []
+
+        # Test Case 3: other question types and models use separate keys
+        print("\n--- Test 3: separate keys ---")
+        cache.add('judge', item, questions[:1])
+        assert cache.take('subjective', item, 1) == []
+        assert ResponseCache(cache_dir, namespace='other-model').take('judge', item, 1) == []
+        assert len(cache.take('judge', item, 1)) == 1
+
+        # Test Case 4: expired entries are ignored
+        print("\n--- Test 4: TTL ---")
+        expiring_cache = ResponseCache(cache_dir, namespace='test-model', ttl_seconds=60)
+        expiring_cache.add('judge', item, questions[:1])
+        path = expiring_cache._path('judge', item)
+        old_time = time.time() - 120
+        os.utime(path, (old_time, old_time))
+        taken = expiring_cache.take('judge', item, 1)
+        print(f"Output: {taken}") # Expected: []
+        assert taken == []
+
+        # Test Case 5: clear_cache removes everything
+        print("\n--- Test 5: clear_cache ---")
+        cache.add('judge', item, questions[:2])
+        cache.clear_cache()
+        print(f"Output: {os.listdir(cache_dir)}") # Expected: []
+        assert os.listdir(cache_dir) == []
+        assert cache.take('judge', item, 2) == []
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n--- ResponseCache tests completed ---")
+
+if __name__ == "__main__":
+    run_response_cache_tests()
@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+
+# Add project root to Python path to ensure imports work correctly
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.components.semantic_cache import SemanticCache
+
+def mock_embed(text: str) -> np.ndarray:
+    """Bag-of-characters embedding: texts made of the same characters get the same vector."""
+    vector = np.zeros(256, dtype=np.float32)
+    for ch in text.lower():
+        vector[ord(ch) % 256] += 1
+    return vector
+
+def run_semantic_cache_tests():
+    """
+    Demonstrates the interface and functionality of the SemanticCache class.
+    Uses a deterministic mock embedding instead of a sentence-transformers model.
+    """
+    print("--- Testing SemanticCache ---")
+
+    cache = SemanticCache(embed=mock_embed, threshold=0.95)
+    namespace = ("Photosynthesis converts light energy into chemical energy.", 70)
+
+    # Test Case 1: lookup in an empty namespace misses
+    print("\n--- Test 1: get (miss) ---")
+    value, vector = cache.get(namespace, "Plants turn light into chemical energy.")
+    print(f"Output: {value}") # Expected: None
+    assert value is None
+    assert vector is not None
+
+    # Test Case 2: add, then look up a reordered text with the same characters
+    print("\n--- Test 2: add and get (hit) ---")
+    cache.add(namespace, "Plants turn light into chemical energy.", (True, 85), vector)
+    value, _ = cache.get(namespace, "Chemical energy: plants turn light into.")
+    print(f"Output: {value}") # Expected: (True, 85)
+    assert value == (True, 85)
+
+    # Test Case 3: a dissimilar text misses
+    print("\n--- Test 3: get (dissimilar text) ---")
+    value, _ = cache.get(namespace, "xyz")
+    print(f"Output: {value}") # Expected: None
+    assert value is None
+
+    # Test Case 4: other namespaces are never consulted
+    print("\n--- Test 4: get (other namespace) ---")
+    value, _ = cache.get((namespace[0], 90), "Plants turn light into chemical energy.")
+    print(f"Output: {value}") # Expected: None
+    assert value is None
+
+    print("\n--- SemanticCache tests completed ---")
+
+if __name__ == "__main__":
+    run_semantic_cache_tests()